@@ -0,0 +1,544 @@
+// Dashboard page behaviour. Shared helpers (initializeProgressBars,
+// updateProgressBar, animateValue) live in main.js, which is loaded first.
+
+// Get CSRF token
+function getCSRFToken() {
+    return document.querySelector('[name=csrfmiddlewaretoken]')?.value || getCookie('csrftoken');
+}
+
+function getCookie(name) {
+    let cookieValue = null;
+    if (document.cookie && document.cookie !== '') {
+        const cookies = document.cookie.split(';');
+        for (let i = 0; i < cookies.length; i++) {
+            const cookie = cookies[i].trim();
+            if (cookie.substring(0, name.length + 1) === (name + '=')) {
+                cookieValue = decodeURIComponent(cookie.substring(name.length + 1));
+                break;
+            }
+        }
+    }
+    return cookieValue;
+}
+
+// Client Management
+function showClientForm() {
+    document.getElementById('client-form').style.display = 'flex';
+    document.getElementById('client-name-input').focus();
+}
+
+function hideClientForm() {
+    document.getElementById('client-form').style.display = 'none';
+    document.getElementById('client-name-input').value = '';
+}
+
+function createClient() {
+    const name = document.getElementById('client-name-input').value.trim();
+    if (!name) {
+        alert('Please enter a client name');
+        return;
+    }
+    
+    const formData = new FormData();
+    formData.append('name', name);
+    formData.append('csrfmiddlewaretoken', getCSRFToken());
+    
+    fetch('/client/create/', {
+        method: 'POST',
+        body: formData,
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            insertClientCard(data.client.name, data.html);
+            updateGlobalProgress(data.global);
+            hideClientForm();
+        } else {
+            alert(data.error || 'Error creating client');
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        alert('Error creating client');
+    });
+}
+
+function deleteClient(clientId, clientName) {
+    if (!confirm(`Are you sure you want to delete "${clientName}" and all its tasks?`)) {
+        return;
+    }
+    
+    const formData = new FormData();
+    formData.append('csrfmiddlewaretoken', getCSRFToken());
+    
+    fetch(`/client/delete/${clientId}/`, {
+        method: 'POST',
+        body: formData,
+        headers: { 'Accept': 'application/json' },
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            removeClientCard(clientId);
+            updateGlobalProgress(data.global);
+        } else {
+            alert(data.error || 'Error deleting client');
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        alert('Error deleting client');
+    });
+}
+
+// Task Management
+function createTask(clientId) {
+    const input = document.getElementById(`task-input-${clientId}`);
+    const title = input.value.trim();
+    
+    if (!title) {
+        alert('Please enter a task title');
+        return;
+    }
+    
+    const formData = new FormData();
+    formData.append('title', title);
+    formData.append('csrfmiddlewaretoken', getCSRFToken());
+    
+    fetch(`/client/${clientId}/task/create/`, {
+        method: 'POST',
+        body: formData,
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            input.value = '';
+            insertTaskRow(clientId, data.task.id, data.html);
+            updateClientProgress(data.client);
+            updateGlobalProgress(data.global);
+        } else {
+            alert(data.error || 'Error creating task');
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        alert('Error creating task');
+    });
+}
+
+function toggleTask(taskId) {
+    const checkbox = document.querySelector(`input[data-task-id="${taskId}"]`);
+    
+    checkbox.disabled = true;
+    
+    // Send the state the user asked for rather than a flip, so a retried or
+    // duplicate request cannot undo it
+    const formData = new FormData();
+    formData.append('completed', checkbox.checked);
+    formData.append('csrfmiddlewaretoken', getCSRFToken());
+    
+    fetch(`/task/completed/${taskId}/`, {
+        method: 'POST',
+        body: formData,
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            setTaskCompleted(taskId, data.is_completed);
+            updateClientProgress(data.client);
+            updateGlobalProgress(data.global);
+        }
+        checkbox.disabled = false;
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        checkbox.checked = !checkbox.checked;
+        checkbox.disabled = false;
+    });
+}
+
+function deleteTask(taskId) {
+    if (!confirm('Are you sure you want to delete this task?')) {
+        return;
+    }
+    
+    const formData = new FormData();
+    formData.append('csrfmiddlewaretoken', getCSRFToken());
+    
+    fetch(`/task/delete/${taskId}/`, {
+        method: 'POST',
+        body: formData,
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            removeTaskRow(taskId);
+            updateClientProgress(data.client);
+            updateGlobalProgress(data.global);
+        } else {
+            alert('Error deleting task');
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        alert('Error deleting task');
+    });
+}
+
+// In-place DOM updates from mutation responses
+function insertClientCard(name, html) {
+    const grid = document.getElementById('clients-grid');
+    const key = name.toLowerCase();
+    
+    // Keep the list ordered by name like the server renders it
+    const next = Array.from(grid.querySelectorAll('.client-list-item'))
+        .find(item => item.getAttribute('data-client-name') > key);
+    const template = document.createElement('template');
+    template.innerHTML = html.trim();
+    grid.insertBefore(template.content.firstElementChild, next || document.getElementById('empty-state'));
+    
+    document.getElementById('empty-state').style.display = 'none';
+    initializeProgressBars();
+}
+
+function removeClientCard(clientId) {
+    const item = document.querySelector(`.client-list-item[data-client-id="${clientId}"]`);
+    if (item) item.remove();
+    if (!document.querySelector('.client-list-item')) {
+        document.getElementById('empty-state').style.display = '';
+    }
+}
+
+function insertTaskRow(clientId, taskId, html) {
+    // Unloaded lists pick the new task up with their first page
+    const list = document.getElementById(`tasks-${clientId}`);
+    if (!list || list.dataset.loaded !== 'true') return;
+    if (list.querySelector(`.task-item[data-task-id="${taskId}"]`)) return;
+    
+    const placeholder = list.querySelector('.no-tasks');
+    if (placeholder) placeholder.remove();
+    list.insertAdjacentHTML('afterbegin', html);
+}
+
+function setTaskCompleted(taskId, isCompleted) {
+    const taskItem = document.querySelector(`.task-item[data-task-id="${taskId}"]`);
+    if (!taskItem) return;
+    
+    taskItem.querySelector('.task-checkbox').checked = isCompleted;
+    taskItem.querySelector('.checkbox-icon').textContent = isCompleted ? '☑' : '□';
+    taskItem.querySelector('.task-title').classList.toggle('completed', isCompleted);
+}
+
+function removeTaskRow(taskId) {
+    const taskItem = document.querySelector(`.task-item[data-task-id="${taskId}"]`);
+    if (!taskItem) return;
+    
+    const list = taskItem.parentElement;
+    taskItem.remove();
+    if (!list.querySelector('.task-item') && !list.dataset.nextCursor) {
+        list.insertAdjacentHTML('beforeend', '<p class="no-tasks">No tasks yet. Add one below!</p>');
+    }
+}
+
+function updateClientProgress(client) {
+    const clientId = client.id;
+    if (!document.getElementById(`client-${clientId}-completion`)) return;
+    animateValue(`client-${clientId}-completion`, 
+        parseInt(document.getElementById(`client-${clientId}-completion`).textContent), 
+        client.completion_percentage);
+    animateValue(`client-${clientId}-remaining`, 
+        parseInt(document.getElementById(`client-${clientId}-remaining`).textContent), 
+        client.remaining_percentage);
+    
+    updateProgressBar(`.circular-progress-client[data-client-id="${clientId}"][data-color="neon-green"]`, client.completion_percentage);
+    updateProgressBar(`.circular-progress-client[data-client-id="${clientId}"][data-color="vivid-orange"]`, client.remaining_percentage);
+    
+    document.getElementById(`client-${clientId}-task-count`).textContent = `(${client.total_tasks} tasks)`;
+    document.getElementById(`client-${clientId}-task-total`).textContent = client.total_tasks;
+}
+
+function updateGlobalProgress(global) {
+    animateValue('global-completion-value', 
+        parseInt(document.getElementById('global-completion-value').textContent), 
+        global.completion_percentage);
+    animateValue('global-remaining-value', 
+        parseInt(document.getElementById('global-remaining-value').textContent), 
+        global.remaining_percentage);
+    
+    updateProgressBar('.circular-progress-global[data-color="neon-green"]', global.completion_percentage);
+    updateProgressBar('.circular-progress-global[data-color="vivid-orange"]', global.remaining_percentage);
+    
+    document.getElementById('global-completed-count').textContent = global.completed_tasks;
+    document.getElementById('global-pending-count').textContent = global.total_tasks - global.completed_tasks;
+    document.getElementById('global-total-clients').textContent = global.total_clients;
+    document.querySelectorAll('.global-total-count').forEach(element => {
+        element.textContent = global.total_tasks;
+    });
+}
+
+// Search Functionality (server-side, see the search/ endpoint)
+let searchTimer = null;
+let searchRequestId = 0;
+
+function filterClients(searchTerm) {
+    const searchValue = searchTerm.trim();
+    const clearBtn = document.getElementById('search-clear-btn');
+    
+    // Show/hide clear button
+    clearBtn.style.display = searchValue.length > 0 ? 'flex' : 'none';
+    
+    // Debounce keystrokes and drop any in-flight search
+    clearTimeout(searchTimer);
+    searchRequestId++;
+    
+    if (!searchValue) {
+        showSearchResults(null);
+        return;
+    }
+    searchTimer = setTimeout(() => runSearch(searchValue), 250);
+}
+
+function runSearch(query) {
+    const requestId = searchRequestId;
+    
+    fetch(`/search/?q=${encodeURIComponent(query)}`)
+    .then(response => response.json())
+    .then(data => {
+        if (requestId !== searchRequestId) return; // A newer search superseded this one
+        if (data.success) {
+            showSearchResults(data);
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+    });
+}
+
+function showSearchResults(data) {
+    const clientItems = document.querySelectorAll('.client-list-item');
+    const noResults = document.getElementById('no-results');
+    const taskResults = document.getElementById('task-search-results');
+    const taskList = document.getElementById('task-search-list');
+    
+    if (!data) {
+        clientItems.forEach(item => { item.style.display = 'block'; });
+        taskResults.style.display = 'none';
+        noResults.style.display = 'none';
+        return;
+    }
+    
+    // Show clients that matched by name or own a matching task
+    const matchedClients = new Set(data.clients.map(client => client.id));
+    data.tasks.forEach(task => matchedClients.add(task.client_id));
+    
+    let visibleCount = 0;
+    clientItems.forEach(item => {
+        const visible = matchedClients.has(parseInt(item.getAttribute('data-client-id')));
+        item.style.display = visible ? 'block' : 'none';
+        if (visible) visibleCount++;
+    });
+    
+    // List matching tasks, best match first
+    taskList.innerHTML = '';
+    data.tasks.forEach(task => {
+        const hit = document.createElement('div');
+        hit.className = 'task-search-hit';
+        hit.textContent = `${task.is_completed ? '☑' : '□'} ${task.title} — ${task.client_name}`;
+        hit.onclick = () => openClient(task.client_id);
+        taskList.appendChild(hit);
+    });
+    taskResults.style.display = data.tasks.length > 0 ? 'block' : 'none';
+    
+    // Show/hide no results message
+    noResults.style.display = visibleCount === 0 ? 'block' : 'none';
+}
+
+function openClient(clientId) {
+    const item = document.querySelector(`.client-list-item[data-client-id="${clientId}"]`);
+    if (!item) return;
+    
+    if (document.getElementById(`client-details-${clientId}`).style.display === 'none') {
+        toggleClient(clientId);
+    }
+    item.scrollIntoView({ behavior: 'smooth', block: 'start' });
+}
+
+function clearSearch() {
+    const searchInput = document.getElementById('client-search-input');
+    searchInput.value = '';
+    filterClients('');
+    searchInput.focus();
+}
+
+// Lazy Task Loading
+function loadTasks(clientId) {
+    const list = document.getElementById(`tasks-${clientId}`);
+    const loadMoreBtn = document.getElementById(`load-more-${clientId}`);
+    const cursor = list.dataset.nextCursor;
+    
+    if (list.dataset.loading === 'true') return;
+    list.dataset.loading = 'true';
+    loadMoreBtn.disabled = true;
+    
+    const url = `/client/${clientId}/tasks/` + (cursor ? `?cursor=${encodeURIComponent(cursor)}` : '');
+    
+    fetch(url)
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            const placeholder = list.querySelector('.tasks-loading');
+            if (placeholder) placeholder.remove();
+            
+            list.insertAdjacentHTML('beforeend', data.html);
+            list.dataset.loaded = 'true';
+            list.dataset.nextCursor = data.next_cursor || '';
+            loadMoreBtn.style.display = data.next_cursor ? 'block' : 'none';
+        } else {
+            alert(data.error || 'Error loading tasks');
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        alert('Error loading tasks');
+    })
+    .finally(() => {
+        list.dataset.loading = 'false';
+        loadMoreBtn.disabled = false;
+    });
+}
+
+function loadArchivedTasks(clientId) {
+    const list = document.getElementById(`archived-${clientId}`);
+    const button = document.getElementById(`show-archived-${clientId}`);
+    const cursor = list.dataset.nextCursor;
+    
+    if (list.dataset.loading === 'true') return;
+    list.dataset.loading = 'true';
+    button.disabled = true;
+    
+    const url = `/client/${clientId}/archived/` + (cursor ? `?cursor=${encodeURIComponent(cursor)}` : '');
+    
+    fetch(url)
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            list.insertAdjacentHTML('beforeend', data.html);
+            list.style.display = 'block';
+            list.dataset.nextCursor = data.next_cursor || '';
+            button.textContent = 'Load more archived';
+            button.style.display = data.next_cursor ? 'block' : 'none';
+        } else {
+            alert(data.error || 'Error loading archived tasks');
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        alert('Error loading archived tasks');
+    })
+    .finally(() => {
+        list.dataset.loading = 'false';
+        button.disabled = false;
+    });
+}
+
+// Live updates from other tabs and devices (see the events/ stream)
+let liveVersion = 0;
+let liveSource = null;
+
+function connectLiveUpdates() {
+    if (!window.EventSource) return;
+    
+    liveSource = new EventSource('/events/');
+    liveSource.onmessage = message => applyLiveEvent(JSON.parse(message.data));
+}
+
+function reloadTaskList(clientId) {
+    const list = document.getElementById(`tasks-${clientId}`);
+    if (!list || list.dataset.loaded !== 'true') return;
+    
+    list.innerHTML = '';
+    list.dataset.nextCursor = '';
+    loadTasks(clientId);
+}
+
+function applyLiveEvent(event) {
+    if (event.type === 'resync') {
+        // The stream dropped events; reopen it to start from a fresh snapshot
+        liveSource.close();
+        connectLiveUpdates();
+        return;
+    }
+    
+    // Events can arrive out of order; counters older than what is shown are skipped
+    const fresh = event.version >= liveVersion;
+    if (fresh) liveVersion = event.version;
+    
+    switch (event.type) {
+    case 'sync': {
+        // Drop cards of clients deleted while this page was not listening
+        const known = new Set(event.clients.map(client => client.id));
+        document.querySelectorAll('.client-list-item').forEach(item => {
+            const clientId = parseInt(item.getAttribute('data-client-id'));
+            if (!known.has(clientId)) removeClientCard(clientId);
+        });
+        break;
+    }
+    case 'client.created':
+        if (!document.querySelector(`.client-list-item[data-client-id="${event.client.id}"]`)) {
+            insertClientCard(event.client.name, event.html);
+        }
+        break;
+    case 'client.deleted':
+        removeClientCard(event.client_id);
+        break;
+    case 'task.created':
+        insertTaskRow(event.task.client_id, event.task.id, event.html);
+        break;
+    case 'task.updated':
+        if (fresh) setTaskCompleted(event.task.id, event.task.is_completed);
+        break;
+    case 'task.deleted':
+        removeTaskRow(event.task.id);
+        break;
+    case 'tasks.changed':
+        event.clients.forEach(client => reloadTaskList(client.id));
+        break;
+    }
+    
+    if (fresh) {
+        if (event.client) updateClientProgress(event.client);
+        (event.clients || []).forEach(updateClientProgress);
+        updateGlobalProgress(event.global);
+    }
+}
+
+connectLiveUpdates();
+
+// Toggle Client Details
+function toggleClient(clientId) {
+    const details = document.getElementById(`client-details-${clientId}`);
+    const header = document.querySelector(`.client-list-item[data-client-id="${clientId}"] .client-list-header`);
+    const expandIcon = header.querySelector('.expand-icon');
+    
+    if (details.style.display === 'none' || !details.style.display) {
+        // Expand
+        details.style.display = 'block';
+        expandIcon.style.transform = 'rotate(180deg)';
+        header.classList.add('expanded');
+        
+        // Fetch the first page of tasks the first time the client is opened
+        if (document.getElementById(`tasks-${clientId}`).dataset.loaded === 'false') {
+            loadTasks(clientId);
+        }
+        
+        // Initialize progress bars if not already done
+        setTimeout(() => {
+            initializeProgressBars();
+        }, 100);
+    } else {
+        // Collapse
+        details.style.display = 'none';
+        expandIcon.style.transform = 'rotate(0deg)';
+        header.classList.remove('expanded');
+    }
+}
@@ -3,16 +3,35 @@ ASGI config for taskmanager project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Run it with an ASGI server, e.g.::
+
+    uvicorn taskmanager.asgi:application
+
+The default live-update broker (tasks.events.LocalBroker) only reaches clients
+connected to the same process. Before running more than one worker, set
+DJANGO_EVENTS_BROKER to tasks.events.RedisBroker, or dashboards will miss the
+changes made through the other workers.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'taskmanager.settings')
+# Serve the task/client JSON endpoints from the async views (tasks/async_views.py)
+os.environ.setdefault('DJANGO_ASYNC_VIEWS', 'True')
 
 application = get_asgi_application()
 
+if settings.ASYNC_VIEWS:
+    # Static files are served here rather than by WhiteNoiseMiddleware, which would
+    # make Django run every request of the async middleware chain in a thread
+    from tasks.staticfiles import ASGIStaticFiles
+
+    application = ASGIStaticFiles(application)
+
 
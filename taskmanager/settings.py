@@ -5,10 +5,18 @@ Django settings for taskmanager project.
 from pathlib import Path
 import os
 import json
-from dotenv import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
+from django.utils.functional import SimpleLazyObject
+
+# Lean startup for cold-starting serverless instances (see tasks.startup): the environment
+# comes from the platform instead of a .env file, the Google credentials are read on first
+# use, and the social login stack is loaded by the first request under accounts/.
+LEAN_STARTUP = os.getenv('DJANGO_LEAN_STARTUP', 'False') == 'True'
+
+if not LEAN_STARTUP:
+    # Load environment variables from .env file
+    from dotenv import load_dotenv
+    load_dotenv()
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -16,15 +24,21 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # Load Google OAuth credentials from JSON file
 GOOGLE_CREDENTIALS_PATH = BASE_DIR / 'config' / 'google-oauth-credentials.json'
 
-try:
-    with open(GOOGLE_CREDENTIALS_PATH) as f:
-        google_creds = json.load(f)['web']
-        GOOGLE_OAUTH2_CLIENT_ID = google_creds['client_id']
-        GOOGLE_OAUTH2_CLIENT_SECRET = google_creds['client_secret']
-except (FileNotFoundError, KeyError, json.JSONDecodeError) as e:
-    # Fallback to environment variables or empty strings
-    GOOGLE_OAUTH2_CLIENT_ID = os.getenv('GOOGLE_OAUTH2_CLIENT_ID', '')
-    GOOGLE_OAUTH2_CLIENT_SECRET = os.getenv('GOOGLE_OAUTH2_CLIENT_SECRET', '')
+
+def load_google_credentials():
+    """(client id, client secret) from GOOGLE_CREDENTIALS_PATH, else from the environment"""
+    try:
+        with open(GOOGLE_CREDENTIALS_PATH) as f:
+            google_creds = json.load(f)['web']
+            return google_creds['client_id'], google_creds['client_secret']
+    except (FileNotFoundError, KeyError, json.JSONDecodeError):
+        # Fallback to environment variables or empty strings
+        return os.getenv('GOOGLE_OAUTH2_CLIENT_ID', ''), os.getenv('GOOGLE_OAUTH2_CLIENT_SECRET', '')
+
+
+def _google_app():
+    client_id, secret = load_google_credentials()
+    return {'client_id': client_id, 'secret': secret, 'key': ''}
 
 
 # Quick-start development settings - unsuitable for production
@@ -57,13 +71,19 @@ INSTALLED_APPS = [
     # Third-party apps
     'allauth',
     'allauth.account',
-    'allauth.socialaccount',
+    # The lean variant leaves the provider modules (and `requests`) unimported until needed
+    'tasks.startup.DeferredSocialAccountConfig' if LEAN_STARTUP else 'allauth.socialaccount',
     'allauth.socialaccount.providers.google',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    # Serves collected static files before any per-request work (see STATICFILES_STORAGE).
+    # Left out with ASYNC_VIEWS, see below
+    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'tasks.middleware.PerformanceMiddleware',  # Server-Timing and per-view histograms, see tasks.metrics
+    'tasks.middleware.ReplicaMiddleware',  # Read-replica routing and read-your-writes, see tasks.replicas
+    'tasks.middleware.SessionMiddleware',  # Coalesces session writes, see tasks.sessions
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -76,7 +96,8 @@ ROOT_URLCONF = 'taskmanager.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates that reports render time to tasks.middleware.PerformanceMiddleware
+        'BACKEND': 'tasks.metrics.TimedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -123,9 +144,29 @@ DATABASES = {
         'OPTIONS': {
             'sslmode': 'require',  # Neon requires SSL
         },
+        # Keep each thread's connection open for this many seconds (0 = close after every
+        # request) instead of paying a new TCP and TLS handshake per request
+        'CONN_MAX_AGE': int(os.getenv('POSTGRES_CONN_MAX_AGE', '60')),
+        # Ping a reused connection before the request's first query, so one the server
+        # dropped while idle is replaced instead of failing the request
+        'CONN_HEALTH_CHECKS': os.getenv('POSTGRES_CONN_HEALTH_CHECKS', 'True') == 'True',
     }
 }
 
+# Connection pool shared by the threads of a process (see tasks.pool), for servers
+# running many threads or ASGI workers against a connection-limited database
+if os.getenv('POSTGRES_POOL', 'False') == 'True':
+    DATABASES['default']['ENGINE'] = 'tasks.postgresql_pool'
+    # Connections go back to the pool at the end of each request
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': int(os.getenv('POSTGRES_POOL_MIN_SIZE', '0')),
+        'max_size': int(os.getenv('POSTGRES_POOL_MAX_SIZE', '10')),
+        'max_lifetime': float(os.getenv('POSTGRES_POOL_MAX_LIFETIME', '1800')),
+        'max_idle': float(os.getenv('POSTGRES_POOL_MAX_IDLE', '300')),
+        'timeout': float(os.getenv('POSTGRES_POOL_TIMEOUT', '10')),
+    }
+
 # Use SQLite for local development if no PostgreSQL credentials are provided
 if not all([os.getenv('POSTGRES_DATABASE'), os.getenv('POSTGRES_USER'), os.getenv('POSTGRES_PASSWORD')]):
     DATABASES['default'] = {
@@ -133,6 +174,34 @@ if not all([os.getenv('POSTGRES_DATABASE'), os.getenv('POSTGRES_USER'), os.geten
         'NAME': BASE_DIR / 'db.sqlite3',
     }
 
+# Read replicas of the default database, one per host in POSTGRES_REPLICA_HOSTS, with
+# the primary's settings otherwise. GET requests read from them (see tasks.replicas).
+# On SQLite, SQLITE_REPLICA_PATHS lists copies of the database file kept up to date by
+# some other means (e.g. Litestream or LiteFS), which try out the same routing locally.
+TASKS_READ_REPLICAS = []
+if DATABASES['default']['ENGINE'] != 'django.db.backends.sqlite3':
+    replica_settings = [
+        {'HOST': host.strip(), 'OPTIONS': dict(DATABASES['default']['OPTIONS'])}
+        for host in filter(None, os.getenv('POSTGRES_REPLICA_HOSTS', '').split(','))
+    ]
+else:
+    replica_settings = [
+        {'NAME': path.strip()}
+        for path in filter(None, os.getenv('SQLITE_REPLICA_PATHS', '').split(','))
+    ]
+for number, replica in enumerate(replica_settings, 1):
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        **replica,
+        'TEST': {'MIRROR': 'default'},  # Tests and benchmarks see the test database
+    }
+    TASKS_READ_REPLICAS.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['tasks.replicas.ReplicaRouter']
+
+# After a write, the browser reads from the primary for this long; keep it above the replica lag
+TASKS_REPLICA_PIN_SECONDS = int(os.getenv('DJANGO_REPLICA_PIN_SECONDS', '10'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -174,7 +243,9 @@ STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'static'),
 ]
 
-# Use Whitenoise to serve static files
+# Use Whitenoise to serve static files. collectstatic writes content-hashed copies of every
+# file plus .gz and (with the Brotli package installed) .br versions; {% static %} links to
+# the hashed names, which WhiteNoiseMiddleware serves with a far-future immutable max-age.
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 # Media files (user-uploaded files)
@@ -203,8 +274,8 @@ SITE_ID = 1
 
 # Authentication backends
 AUTHENTICATION_BACKENDS = [
-    # Needed to login by username in Django admin, regardless of `allauth`
-    'django.contrib.auth.backends.ModelBackend',
+    # Login by username or email with one indexed query (also used by the Django admin)
+    'tasks.backends.EmailOrUsernameBackend',
 
     # `allauth` specific authentication methods, such as login by email
     'allauth.account.auth_backends.AuthenticationBackend',
@@ -212,8 +283,9 @@ AUTHENTICATION_BACKENDS = [
 
 # Google OAuth settings (loaded from config file or environment variables)
 ALLOWED_HOSTS = ['.vercel.app', '.now.sh', '127.0.0.1', 'localhost']
-# Debug settings
-DEBUG = True
+# Debug settings: on by default for local development; set DJANGO_DEBUG=False in
+# production, which also makes {% static %} link to the fingerprinted files
+DEBUG = os.getenv('DJANGO_DEBUG', 'True') == 'True'
 
 # Ensure these domains are in ALLOWED_HOSTS
 ALLOWED_HOSTS = ['localhost', '127.0.0.1']
@@ -236,15 +308,64 @@ GOOGLE_OAUTH2_REDIRECT_URI = 'http://localhost:8000/accounts/google/login/callba
 # Session settings for smoother auth flow
 SESSION_COOKIE_AGE = 60 * 60 * 24 * 30  # 30 days
 SESSION_COOKIE_HTTPONLY = True
-SESSION_SAVE_EVERY_REQUEST = True
-
-# Cache settings (using local memory cache for development)
+# Sliding expiry without a write per request: sessions are read through the cache and
+# an unchanged session is re-saved only once less than 90% of its lifetime remains
+SESSION_ENGINE = 'tasks.sessions'
+SESSION_SAVE_EVERY_REQUEST = False
+SESSION_REFRESH_THRESHOLD = 0.9
+
+# Cache settings
+# The cache is shared by every worker process: it backs the session read path and the
+# version-keyed dashboard cache (tasks.cache). Point DJANGO_CACHE_BACKEND/DJANGO_CACHE_LOCATION
+# at Redis or Memcached in production, e.g. django.core.cache.backends.redis.RedisCache
+# with redis://127.0.0.1:6379/1. A DJANGO_CACHE_LOCATION on its own is a directory for a
+# file-based cache; without one each process gets its own in-memory cache.
+CACHE_LOCATION = os.getenv('DJANGO_CACHE_LOCATION', '')
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
+        'BACKEND': os.getenv('DJANGO_CACHE_BACKEND', (
+            'django.core.cache.backends.filebased.FileBasedCache' if CACHE_LOCATION
+            else 'django.core.cache.backends.locmem.LocMemCache'
+        )),
+        'LOCATION': CACHE_LOCATION or 'goalgrid-cache',
     }
 }
+if CACHES['default']['BACKEND'].endswith('FileBasedCache'):
+    # Entries are unpickled on read, so nobody else may be able to write them
+    os.makedirs(CACHE_LOCATION, mode=0o700, exist_ok=True)
+    os.chmod(CACHE_LOCATION, 0o700)
+if CACHES['default']['BACKEND'].endswith(('FileBasedCache', 'LocMemCache')):
+    # Sessions live here too, so raise the default 300-entry cull limit
+    CACHES['default']['OPTIONS'] = {'MAX_ENTRIES': 10000}
+TASKS_CACHE_ALIAS = 'default'
+TASKS_CACHE_TIMEOUT = 60 * 60  # Entries are invalidated by version bumps, not by expiry
+# Changing this (e.g. per release) invalidates every dashboard/JSON ETag handed out so far
+TASKS_ETAG_SALT = os.getenv('DJANGO_ETAG_SALT', os.getenv('VERCEL_GIT_COMMIT_SHA', ''))
+# Rendered dashboard client cards, keyed on the client's id and version (see dashboard.html).
+# Entries are never stale, so a per-process cache is enough.
+CACHES['fragments'] = {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'goalgrid-fragments',
+    'OPTIONS': {'MAX_ENTRIES': 20000},
+}
+TASKS_FRAGMENT_TIMEOUT = 60 * 60
+
+# Route the JSON mutation endpoints to the async views in tasks/async_views.py.
+# taskmanager/asgi.py enables this; under WSGI the sync views are cheaper.
+ASYNC_VIEWS = os.getenv('DJANGO_ASYNC_VIEWS', 'False') == 'True'
+if ASYNC_VIEWS:
+    # Sync-only; taskmanager/asgi.py serves static files in front of Django instead (see tasks.staticfiles)
+    MIDDLEWARE.remove('whitenoise.middleware.WhiteNoiseMiddleware')
+
+# Live dashboard updates (tasks.events). LocalBroker only reaches streams served by
+# the publishing process; use tasks.events.RedisBroker with several workers.
+TASKS_EVENTS_BROKER = os.getenv('DJANGO_EVENTS_BROKER', 'tasks.events.LocalBroker')
+TASKS_EVENTS_REDIS_URL = os.getenv('DJANGO_EVENTS_REDIS_URL', 'redis://127.0.0.1:6379/0')
+TASKS_EVENTS_REDIS_CHANNEL = 'goalgrid:events'
+
+# Send per-request db/template/total timings to the browser (tasks.middleware.PerformanceMiddleware).
+# Off unless DEBUG: the timings tell anyone how much work a request caused on the backend.
+TASKS_SERVER_TIMING = os.getenv('DJANGO_SERVER_TIMING', str(DEBUG)) == 'True'
 
 # Security settings for production (commented out for development)
 # CSRF_COOKIE_SECURE = True
@@ -272,11 +393,7 @@ SOCIALACCOUNT_PROVIDERS = {
         ],
         'CALLBACK_URL': GOOGLE_OAUTH2_REDIRECT_URI,
         'DEFAULT_SCOPE': ['profile', 'email'],
-        'APP': {
-            'client_id': GOOGLE_OAUTH2_CLIENT_ID,
-            'secret': GOOGLE_OAUTH2_CLIENT_SECRET,
-            'key': ''
-        }
+        'APP': SimpleLazyObject(_google_app) if LEAN_STARTUP else _google_app(),
     }
 }
 
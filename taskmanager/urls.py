@@ -1,15 +1,17 @@
 """
 URL configuration for taskmanager project.
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 from django.views.generic import RedirectView
 
+from tasks.startup import deferred_include
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('tasks.urls')),
-    path('accounts/', include('allauth.urls')),
+    # In lean startup mode allauth (and its social providers) load on the first accounts/ request
+    deferred_include('accounts/', 'allauth.urls') if settings.LEAN_STARTUP else path('accounts/', include('allauth.urls')),
     path('accounts/profile/', RedirectView.as_view(url='/', permanent=True)),
 ]
-
-
@@ -1,35 +1,248 @@
 from django.contrib import admin
-from .models import Client, Task
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.db.models import F
+from django.utils.functional import cached_property
+
+from .counters import rebuild_user_stats, recount_client_owners
+from .models import Client, Task, TaskArchive, UserStats
+from .mutations import delete_client
+
+
+# Below this many rows an exact COUNT(*) is cheap enough to keep
+ESTIMATED_COUNT_THRESHOLD = 100000
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that, for an unfiltered changelist on PostgreSQL, takes the row
+    count from the planner's statistics instead of a COUNT(*) over the whole
+    table. Filtered lists (including every non-superuser's) are counted exactly.
+
+    A list whose only condition is ``unfiltered_where`` (the soft-delete filter
+    every changelist of live rows carries) still counts as unfiltered. The
+    estimate then includes the few rows waiting to be purged.
+    """
+
+    def __init__(self, object_list, per_page, orphans=0, allow_empty_first_page=True, unfiltered_where=None):
+        super().__init__(object_list, per_page, orphans, allow_empty_first_page)
+        self.unfiltered_where = unfiltered_where
+
+    @cached_property
+    def count(self):
+        if self.is_unfiltered():
+            estimate = self.estimated_count()
+            if estimate is not None and estimate >= ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super().count
+
+    def is_unfiltered(self):
+        where = self.object_list.query.where
+        return not where or where == self.unfiltered_where
+
+    def estimated_count(self):
+        """The planner's row estimate for the table, or None where there is none"""
+        connection = connections[self.object_list.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                [self.object_list.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+
+class EstimatedCountAdmin(admin.ModelAdmin):
+    """ModelAdmin whose unfiltered changelist is counted by EstimatedCountPaginator"""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_live_queryset(self, request):
+        """Every row the changelist may show, before the per-user restriction"""
+        return super().get_queryset(request)
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        return self.paginator(
+            queryset, per_page, orphans, allow_empty_first_page,
+            unfiltered_where=self.get_live_queryset(request).query.where,
+        )
+
+
+class InputFilter(admin.SimpleListFilter):
+    """A list filter with a text box, for columns with too many values to list as links"""
+    template = 'admin/tasks/input_filter.html'
+    placeholder = ''
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def choices(self, changelist):
+        # One pseudo-choice carrying what the template needs to rebuild the query string
+        yield {
+            'selected': self.value() is None,
+            'query_string': changelist.get_query_string(remove=[self.parameter_name]),
+            'query_parts': [
+                (name, value)
+                for name, value in changelist.get_filters_params().items()
+                if name != self.parameter_name
+            ],
+        }
+
+
+class UserFilter(InputFilter):
+    title = 'user'
+    parameter_name = 'username'
+    placeholder = 'Username'
+    user_lookup = 'user__username'
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{self.user_lookup: self.value().strip()})
+        return queryset
+
+
+class TaskUserFilter(UserFilter):
+    user_lookup = 'client__user__username'
+
+
+class ClientFilter(InputFilter):
+    title = 'client'
+    parameter_name = 'client_name'
+    placeholder = 'Client name'
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(client__name=self.value().strip())
+        return queryset
+
+
+class RecountClientsAdmin(EstimatedCountAdmin):
+    """
+    Admin for a model with a ``client`` foreign key whose rows count towards the
+    client counters. Its writes go straight to the table, so each one re-derives
+    the affected clients' counters (bumping their cache versions) in the same
+    transaction.
+    """
+
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            client_ids = {obj.client_id}
+            if change:
+                # A task moved to another client changes both
+                client_ids.add(type(obj).objects.values_list('client_id', flat=True).get(pk=obj.pk))
+            super().save_model(request, obj, form, change)
+            recount_client_owners(client_ids)
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            super().delete_model(request, obj)
+            recount_client_owners({obj.client_id})
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            client_ids = set(queryset.values_list('client_id', flat=True))
+            super().delete_queryset(request, queryset)
+            recount_client_owners(client_ids)
 
 
 @admin.register(Client)
-class ClientAdmin(admin.ModelAdmin):
+class ClientAdmin(EstimatedCountAdmin):
+    # The task counters are stored columns (see tasks.counters), so no per-row COUNTs
     list_display = ['name', 'user', 'total_tasks', 'completed_tasks', 'completion_percentage', 'created_at']
-    list_filter = ['created_at', 'user']
+    list_select_related = ['user']
+    list_filter = ['created_at', UserFilter]
     search_fields = ['name', 'user__username']
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['total_tasks', 'completed_tasks', 'version', 'created_at', 'updated_at', 'deleted_at']
+    autocomplete_fields = ['user']
+    
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            # Rebuild the rollup of the old owner too when the client changes hands
+            user_ids = {obj.user_id}
+            if change:
+                user_ids.add(Client.objects.values_list('user_id', flat=True).get(pk=obj.pk))
+            super().save_model(request, obj, form, change)
+            # A renamed client needs its cached dashboard card rebuilt
+            Client.objects.filter(pk=obj.pk).update(version=F('version') + 1)
+            for user_id in user_ids:
+                rebuild_user_stats(user_id)
+    
+    def delete_model(self, request, obj):
+        # Soft delete, as from the dashboard; purge_deleted_clients removes the rows
+        delete_client(obj.user, obj.pk)
+    
+    def delete_queryset(self, request, queryset):
+        for client in queryset.select_related('user'):
+            delete_client(client.user, client.pk)
     
     def get_queryset(self, request):
-        qs = super().get_queryset(request)
+        # The default manager already leaves out soft-deleted clients
+        qs = self.get_live_queryset(request)
         if request.user.is_superuser:
             return qs
         return qs.filter(user=request.user)
 
 
 @admin.register(Task)
-class TaskAdmin(admin.ModelAdmin):
+class TaskAdmin(RecountClientsAdmin):
     list_display = ['title', 'client', 'client_user', 'is_completed', 'created_at']
-    list_filter = ['is_completed', 'client', 'created_at']
+    list_select_related = ['client__user']
+    list_filter = ['is_completed', ClientFilter, TaskUserFilter, 'created_at']
     search_fields = ['title', 'client__name', 'client__user__username']
     readonly_fields = ['created_at', 'updated_at']
+    autocomplete_fields = ['client']
     
+    @admin.display(description='User', ordering='client__user__username')
     def client_user(self, obj):
         return obj.client.user.username
-    client_user.short_description = 'User'
+    
+    def get_live_queryset(self, request):
+        # Tasks of soft-deleted clients are waiting to be purged
+        return super().get_live_queryset(request).filter(client__deleted_at__isnull=True)
     
     def get_queryset(self, request):
-        qs = super().get_queryset(request)
+        qs = self.get_live_queryset(request)
         if request.user.is_superuser:
             return qs
         return qs.filter(client__user=request.user)
 
+
+@admin.register(TaskArchive)
+class TaskArchiveAdmin(RecountClientsAdmin):
+    # Written only by the archive_tasks command
+    list_display = ['title', 'client', 'client_user', 'created_at', 'archived_at']
+    list_select_related = ['client__user']
+    list_filter = [ClientFilter, TaskUserFilter, 'archived_at']
+    search_fields = ['title', 'client__name', 'client__user__username']
+    readonly_fields = ['id', 'client', 'title', 'created_at', 'updated_at', 'archived_at']
+    
+    @admin.display(description='User', ordering='client__user__username')
+    def client_user(self, obj):
+        return obj.client.user.username
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def get_live_queryset(self, request):
+        # Tasks of soft-deleted clients are waiting to be purged
+        return super().get_live_queryset(request).filter(client__deleted_at__isnull=True)
+    
+    def get_queryset(self, request):
+        qs = self.get_live_queryset(request)
+        if request.user.is_superuser:
+            return qs
+        return qs.filter(client__user=request.user)
+
+
+@admin.register(UserStats)
+class UserStatsAdmin(EstimatedCountAdmin):
+    list_display = ['user', 'total_clients', 'total_tasks', 'completed_tasks', 'updated_at']
+    list_select_related = ['user']
+    search_fields = ['user__username']
+    readonly_fields = ['total_clients', 'total_tasks', 'completed_tasks', 'updated_at']
+    autocomplete_fields = ['user']
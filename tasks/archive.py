@@ -0,0 +1,58 @@
+"""
+Archival of old completed tasks out of the hot Task table.
+
+Completed tasks that have not changed since a cutoff are moved, in small
+batches, into TaskArchive. Each batch is its own transaction: the task rows are
+locked with ``SELECT ... FOR UPDATE SKIP LOCKED`` (rows a live request is
+toggling or deleting are left for a later run), copied with their original ids
+and timestamps, and deleted. Archived tasks still count as completed tasks, so
+the stored client and user counters are left alone; only the owners' version is
+bumped so cached pages and ETags pick up the change.
+
+Batches walk the table in id order, and everything a finished batch moved is
+gone from Task, so an interrupted run is resumed by simply running it again.
+"""
+from django.db import transaction
+
+from .counters import bump_versions
+from .models import Task, TaskArchive
+
+
+ARCHIVE_BATCH_SIZE = 1000
+
+
+def archive_batch(cutoff, after_id=0, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Archive up to ``batch_size`` completed tasks last updated before ``cutoff``
+    with an id above ``after_id``. Returns (archived, last_id); last_id is None
+    once there is nothing left to archive.
+    """
+    with transaction.atomic():
+        tasks = list(
+            archivable_tasks(cutoff).select_for_update(skip_locked=True, of=('self',))
+            .filter(pk__gt=after_id)
+            .only('id', 'client_id', 'title', 'created_at', 'updated_at')
+            .order_by('pk')[:batch_size]
+        )
+        if not tasks:
+            return 0, None
+
+        # ignore_conflicts makes a batch that was copied but not deleted safe to redo
+        TaskArchive.objects.bulk_create([
+            TaskArchive(
+                id=task.id,
+                client_id=task.client_id,
+                title=task.title,
+                created_at=task.created_at,
+                updated_at=task.updated_at,
+            )
+            for task in tasks
+        ], ignore_conflicts=True)
+        Task.objects.filter(pk__in=[task.pk for task in tasks]).delete()
+        bump_versions({task.client_id for task in tasks})
+    return len(tasks), tasks[-1].pk
+
+
+def archivable_tasks(cutoff):
+    # Tasks of deleted clients are about to be purged, not archived
+    return Task.objects.filter(is_completed=True, updated_at__lt=cutoff, client__deleted_at__isnull=True)
@@ -0,0 +1,245 @@
+"""
+Async versions of the JSON mutation endpoints, for ASGI deployments.
+
+Served instead of their sync counterparts when ASYNC_VIEWS is enabled (the ASGI
+entry point turns it on, see taskmanager/asgi.py). Lookups and counter
+read-backs use Django's async ORM API. Django 4.2 has no async transactions, so
+each locked read-modify-write runs in a single sync_to_async hop through the
+shared functions in tasks.mutations. An in-flight request therefore only holds
+a thread while it is actually talking to the database.
+
+The ``events`` stream is always served from here, since it only makes sense on
+an event loop.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.contrib.auth.views import redirect_to_login
+from django.http import Http404, HttpResponse, HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
+
+from .counters import get_user_stats
+from .events import event_stream, get_broker
+from .models import Client, UserStats
+from .mutations import create_client, create_task, delete_task, set_task_completed, toggle_task
+from .views import _client_progress, _global_progress, _parse_bool, _publish
+
+
+def async_login_required(view_func):
+    """login_required for async views: resolves the session user off the event loop"""
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        user = await sync_to_async(get_user)(request)
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        request.user = user
+        return await view_func(request, *args, **kwargs)
+    return wrapper
+
+
+def async_require_http_methods(methods):
+    """require_http_methods for async views"""
+    def decorator(view_func):
+        @wraps(view_func)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return HttpResponseNotAllowed(methods)
+            return await view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+async_require_GET = async_require_http_methods(['GET'])
+async_require_POST = async_require_http_methods(['POST'])
+
+
+async def _refresh_counters(client, user):
+    """Re-read the counters a mutation just changed"""
+    await client.arefresh_from_db(fields=['total_tasks', 'completed_tasks'])
+    return await UserStats.objects.aget(user=user)
+
+
+@async_require_POST
+@async_login_required
+async def client_create(request):
+    """Create a new client"""
+    client_name = request.POST.get('name', '').strip()
+
+    if not client_name:
+        return JsonResponse({'success': False, 'error': 'Client name is required'}, status=400)
+
+    # Check if client exists for this user only
+    if await Client.objects.filter(user=request.user, name=client_name).aexists():
+        return JsonResponse({'success': False, 'error': 'Client with this name already exists'}, status=400)
+
+    client = await sync_to_async(create_client)(request.user, client_name)
+    stats = await UserStats.objects.aget(user=request.user)
+    client_data = {
+        'id': client.id,
+        'name': client.name,
+        'completion_percentage': client.completion_percentage,
+        'remaining_percentage': client.remaining_percentage,
+        'total_tasks': client.total_tasks,
+        'completed_tasks': client.completed_tasks,
+    }
+    html = render_to_string('tasks/partials/client_card.html', {'client': client})
+    await sync_to_async(_publish)(request.user, 'client.created', stats, client=client_data, html=html)
+
+    return JsonResponse({
+        'success': True,
+        'client': client_data,
+        'global': _global_progress(stats),
+        'html': html,
+    })
+
+
+@async_require_POST
+@async_login_required
+async def task_create(request, client_id):
+    """Create a new task for a client"""
+    # Only allow creating tasks for own clients
+    try:
+        client = await Client.objects.aget(pk=client_id, user=request.user)
+    except Client.DoesNotExist:
+        raise Http404('No Client matches the given query.')
+    task_title = request.POST.get('title', '').strip()
+
+    if not task_title:
+        return JsonResponse({'success': False, 'error': 'Task title is required'}, status=400)
+
+    task = await sync_to_async(create_task)(client, task_title)
+
+    # Read back the updated client progress
+    stats = await _refresh_counters(client, request.user)
+    html = render_to_string('tasks/partials/task_row.html', {'task': task})
+    await sync_to_async(_publish)(
+        request.user, 'task.created', stats,
+        task={'id': task.id, 'client_id': client.id, 'is_completed': task.is_completed},
+        client=_client_progress(client),
+        html=html,
+    )
+
+    return JsonResponse({
+        'success': True,
+        'task': {
+            'id': task.id,
+            'title': task.title,
+            'is_completed': task.is_completed,
+        },
+        'client': _client_progress(client),
+        'global': _global_progress(stats),
+        'html': html,
+    })
+
+
+@async_require_POST
+@async_login_required
+async def task_toggle(request, pk):
+    """Toggle task completion status via AJAX"""
+    # Only allow toggling own tasks
+    task = await sync_to_async(toggle_task)(request.user, pk)
+
+    # Read back the updated client and global progress
+    client = task.client
+    stats = await _refresh_counters(client, request.user)
+    await sync_to_async(_publish)(
+        request.user, 'task.updated', stats,
+        task={'id': task.id, 'client_id': client.id, 'is_completed': task.is_completed},
+        client=_client_progress(client),
+    )
+
+    return JsonResponse({
+        'success': True,
+        'is_completed': task.is_completed,
+        'client': _client_progress(client),
+        'global': _global_progress(stats),
+    })
+
+
+@async_require_POST
+@async_login_required
+async def task_set_completed(request, pk):
+    """Set task completion to the posted state via AJAX; repeating the request is harmless"""
+    try:
+        completed = _parse_bool(request.POST.get('completed'))
+    except ValueError:
+        completed = None
+    if completed is None:
+        return JsonResponse({'success': False, 'error': 'completed must be true or false'}, status=400)
+
+    # Only allow updating own tasks
+    task, changed = await sync_to_async(set_task_completed)(request.user, pk, completed)
+
+    client = task.client
+    stats = await _refresh_counters(client, request.user)
+    if changed:
+        await sync_to_async(_publish)(
+            request.user, 'task.updated', stats,
+            task={'id': task.id, 'client_id': client.id, 'is_completed': task.is_completed},
+            client=_client_progress(client),
+        )
+
+    return JsonResponse({
+        'success': True,
+        'changed': changed,
+        'is_completed': task.is_completed,
+        'client': _client_progress(client),
+        'global': _global_progress(stats),
+    })
+
+
+@async_require_POST
+@async_login_required
+async def task_delete(request, pk):
+    """Delete a task"""
+    # Only allow deleting own tasks
+    task = await sync_to_async(delete_task)(request.user, pk)
+
+    # Read back the updated client progress
+    client = task.client
+    stats = await _refresh_counters(client, request.user)
+    await sync_to_async(_publish)(
+        request.user, 'task.deleted', stats,
+        task={'id': pk, 'client_id': client.id},
+        client=_client_progress(client),
+    )
+
+    return JsonResponse({
+        'success': True,
+        'client': _client_progress(client),
+        'global': _global_progress(stats),
+    })
+
+
+@async_require_GET
+@async_login_required
+async def events(request):
+    """Server-sent event stream of changes to the user's clients and tasks (see tasks.events)"""
+    if not settings.ASYNC_VIEWS:
+        # Under WSGI an open stream would pin a worker thread for its whole life.
+        # 204 tells EventSource to stop reconnecting; the page still works without it.
+        return HttpResponse(status=204)
+
+    # Subscribe before taking the snapshot so no change falls between the two
+    subscription = get_broker().subscribe(request.user.pk)
+    try:
+        stats = await sync_to_async(get_user_stats)(request.user)
+        snapshot = {
+            'type': 'sync',
+            'version': stats.version,
+            'global': _global_progress(stats),
+            'clients': [
+                _client_progress(client)
+                async for client in Client.objects.filter(user=request.user).only('id', 'total_tasks', 'completed_tasks')
+            ],
+        }
+    except BaseException:
+        subscription.close()
+        raise
+
+    response = StreamingHttpResponse(event_stream(subscription, snapshot), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Keep nginx-style proxies from buffering the stream
+    return response
@@ -0,0 +1,45 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.db.models import Q
+
+
+UserModel = get_user_model()
+
+
+def find_user(identifier):
+    """
+    Resolve an email address or a username to a user with a single query over
+    the username (unique) and email (indexed) columns. An unambiguous email
+    match wins over a username match, mirroring the old email-then-username
+    lookup order.
+    """
+    candidates = list(
+        UserModel._default_manager.filter(Q(email=identifier) | Q(username=identifier))[:3]
+    )
+    by_email = [user for user in candidates if user.email == identifier]
+    if len(by_email) == 1:
+        return by_email[0]
+    for user in candidates:
+        if user.get_username() == identifier:
+            return user
+    return None
+
+
+class EmailOrUsernameBackend(ModelBackend):
+    """ModelBackend that accepts either the username or the email address"""
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+
+        user = find_user(username)
+        if user is None:
+            # Run the default password hasher once to reduce the timing
+            # difference between an existing and a nonexistent user.
+            UserModel().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
@@ -0,0 +1,144 @@
+"""
+Batch task operations applied in a single transaction.
+
+A batch is a list of operations such as::
+
+    [
+        {"op": "create", "client_id": 3, "title": "Send invoice"},
+        {"op": "complete", "task_id": 17},
+        {"op": "uncomplete", "task_id": 18},
+        {"op": "delete", "task_id": 19},
+        {"op": "complete_all", "client_id": 3},
+        {"op": "delete_all", "client_id": 4},
+    ]
+
+Operations are grouped by kind and applied set-wise, in the order creates,
+completion changes, deletes, using bulk_create and queryset update()/delete().
+Completing and uncompleting the same task (or client) in one batch is rejected.
+Ownership of every referenced client and task is checked up front with one
+query each, and the affected clients' counters are re-derived once at the end.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .counters import recount_clients
+from .models import Client, Task
+
+
+MAX_BATCH_OPERATIONS = 1000
+
+CLIENT_OPERATIONS = {'create', 'complete_all', 'uncomplete_all', 'delete_all'}
+TASK_OPERATIONS = {'complete', 'uncomplete', 'delete'}
+
+
+class BatchError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def _parse(operations):
+    """Validate the shape of each operation and group ids by kind"""
+    if not isinstance(operations, list) or not operations:
+        raise BatchError('operations must be a non-empty list')
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        raise BatchError(f'At most {MAX_BATCH_OPERATIONS} operations are allowed per batch')
+
+    creates = []
+    by_client = {op: set() for op in CLIENT_OPERATIONS - {'create'}}
+    by_task = {op: set() for op in TASK_OPERATIONS}
+    for operation in operations:
+        if not isinstance(operation, dict):
+            raise BatchError('Each operation must be an object')
+        op = operation.get('op')
+        try:
+            if op == 'create':
+                title = str(operation.get('title', '')).strip()
+                if not title:
+                    raise BatchError('Task title is required')
+                creates.append((int(operation['client_id']), title))
+            elif op in CLIENT_OPERATIONS:
+                by_client[op].add(int(operation['client_id']))
+            elif op in TASK_OPERATIONS:
+                by_task[op].add(int(operation['task_id']))
+            else:
+                raise BatchError(f'Unknown operation: {op!r}')
+        except (KeyError, TypeError, ValueError):
+            raise BatchError(f'Invalid {op} operation') from None
+
+    # Either state could be meant, so neither wins
+    for kind, ids, complete, uncomplete in (
+        ('task', by_task, 'complete', 'uncomplete'),
+        ('client', by_client, 'complete_all', 'uncomplete_all'),
+    ):
+        conflicting = ids[complete] & ids[uncomplete]
+        if conflicting:
+            raise BatchError(f'Conflicting operations for {kind} {min(conflicting)}')
+    return creates, by_client, by_task
+
+
+def apply_batch(user, operations):
+    """
+    Apply ``operations`` for ``user`` atomically. Returns a dict with the created
+    task ids, the number of updated and deleted tasks, and the affected clients
+    with fresh counters. Raises BatchError without changing anything if any
+    operation is malformed or references another user's data.
+    """
+    creates, by_client, by_task = _parse(operations)
+
+    task_ids = set().union(*by_task.values())
+    client_ids = {client_id for client_id, _ in creates}.union(*by_client.values())
+
+    with transaction.atomic():
+        task_clients = dict(
+            Task.objects.filter(pk__in=task_ids, client__user=user, client__deleted_at__isnull=True)
+            .values_list('id', 'client_id')
+        )
+        if len(task_clients) != len(task_ids):
+            raise BatchError('Task not found', status=404)
+        affected = client_ids | set(task_clients.values())
+
+        # Lock the affected clients so concurrent single-task mutations queue behind the batch
+        owned = set(
+            Client.objects.select_for_update()
+            .filter(pk__in=affected, user=user)
+            .values_list('pk', flat=True)
+        )
+        if not client_ids <= owned:
+            raise BatchError('Client not found', status=404)
+
+        now = timezone.now()
+        created = Task.objects.bulk_create([
+            Task(client_id=client_id, title=title) for client_id, title in creates
+        ])
+
+        # A task both completed and deleted in one batch is simply deleted
+        deleted_ids = by_task['delete']
+        updated = 0
+        for op, is_completed in (('complete', True), ('uncomplete', False)):
+            ids = by_task[op] - deleted_ids
+            if ids:
+                updated += Task.objects.filter(pk__in=ids).exclude(is_completed=is_completed).update(
+                    is_completed=is_completed, updated_at=now,
+                )
+        for op, is_completed in (('complete_all', True), ('uncomplete_all', False)):
+            if by_client[op]:
+                updated += Task.objects.filter(client_id__in=by_client[op]).exclude(is_completed=is_completed).update(
+                    is_completed=is_completed, updated_at=now,
+                )
+
+        deleted = 0
+        if deleted_ids:
+            deleted += Task.objects.filter(pk__in=deleted_ids).delete()[0]
+        if by_client['delete_all']:
+            deleted += Task.objects.filter(client_id__in=by_client['delete_all']).delete()[0]
+
+        clients = recount_clients(user.pk, affected)
+
+    return {
+        'created': [task.pk for task in created],
+        'updated': updated,
+        'deleted': deleted,
+        'clients': clients,
+    }
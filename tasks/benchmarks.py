@@ -0,0 +1,215 @@
+"""
+Benchmark harness: a throwaway database, a synthetic data generator and the
+per-endpoint latency/query-budget suite run by the ``benchmark`` command.
+
+``generate_dataset`` builds N users x M clients x K tasks with bulk inserts,
+reproducibly from a seed, with the counters and rollups filled in so the data
+looks exactly like data written through the views. ``run_endpoint_benchmarks``
+drives the views through the test client against one generated user and
+records the latency and the number of queries of every request.
+
+The query budgets are the most queries a single request may issue, including
+the session and user lookups. They must not depend on the dataset size: an
+endpoint that needs more queries for a bigger account has an N+1 problem.
+"""
+import os
+import random
+import statistics
+import tempfile
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.test import Client as HttpClient
+from django.test.utils import (
+    CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment,
+)
+
+from .models import Client, Task, UserStats
+
+
+QUERY_BUDGETS = {
+    'dashboard': 4,
+    'task_toggle': 9,
+    'task_set_completed': 9,
+    'task_create': 9,
+    'task_delete': 9,
+    'client_create': 7,
+}
+
+DatasetSize = namedtuple('DatasetSize', ['users', 'clients', 'tasks'])
+EndpointResult = namedtuple('EndpointResult', ['endpoint', 'latencies', 'queries'])
+
+WORDS = [
+    'review', 'invoice', 'call', 'draft', 'send', 'update', 'plan', 'fix', 'audit', 'design',
+    'report', 'contract', 'meeting', 'budget', 'launch', 'follow-up', 'proposal', 'deploy',
+]
+
+
+def parse_size(value):
+    """Parse an ``NxMxK`` (users x clients per user x tasks per client) dataset size"""
+    try:
+        size = DatasetSize(*(int(part) for part in value.lower().split('x')))
+    except (TypeError, ValueError):
+        raise ValueError(f'Invalid dataset size {value!r}, expected NxMxK') from None
+    if min(size) < 1:
+        raise ValueError(f'Invalid dataset size {value!r}, every dimension must be at least 1')
+    return size
+
+
+def _begin_immediate(execute, sql, params, many, context):
+    # SQLite ignores SELECT ... FOR UPDATE, so two deferred transactions that both
+    # read a row and then write it deadlock instead of queueing. Taking the write
+    # lock up front makes concurrent writers wait for each other (up to the busy
+    # timeout) the way they would on a server database.
+    if sql == 'BEGIN':
+        sql = 'BEGIN IMMEDIATE'
+    return execute(sql, params, many, context)
+
+
+def _install_begin_immediate(sender, connection, **kwargs):
+    if connection.vendor == 'sqlite':
+        connection.execute_wrappers.append(_begin_immediate)
+
+
+@contextmanager
+def benchmark_database():
+    """
+    Run the block against a freshly migrated test database and private
+    in-memory caches, all discarded afterwards. SQLite test databases are
+    file-backed so that worker threads can share them.
+    """
+    setup_test_environment()
+    test_settings = connection.settings_dict.setdefault('TEST', {})
+    if connection.vendor == 'sqlite' and not test_settings.get('NAME'):
+        test_settings['NAME'] = os.path.join(tempfile.gettempdir(), 'goalgrid-benchmark.sqlite3')
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    connection_created.connect(_install_begin_immediate)
+    try:
+        with override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark'},
+            'fragments': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark-fragments'},
+        }):
+            yield
+    finally:
+        connection_created.disconnect(_install_begin_immediate)
+        connections.close_all()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def generate_dataset(users, clients, tasks, seed=0, prefix='bench', completed_ratio=0.5, batch_size=5000):
+    """
+    Create ``users`` users with ``clients`` clients each and ``tasks`` tasks per
+    client using bulk inserts. The same arguments always produce the same data.
+    Every user's password is ``prefix``. Returns the created users.
+    """
+    rng = random.Random(seed)
+    password = make_password(prefix)
+    created_users = User.objects.bulk_create([
+        User(username=f'{prefix}-{seed}-{n}', email=f'{prefix}-{seed}-{n}@example.com', password=password)
+        for n in range(users)
+    ])
+    if any(user.pk is None for user in created_users):
+        created_users = list(User.objects.filter(username__startswith=f'{prefix}-{seed}-').order_by('pk'))
+
+    stats = []
+    for user in created_users:
+        # Decide every task's state up front so the client counters can be inserted with the clients
+        states = [[rng.random() < completed_ratio for _ in range(tasks)] for _ in range(clients)]
+        user_clients = Client.objects.bulk_create([
+            Client(
+                user=user,
+                name=f'{rng.choice(WORDS).title()} {rng.choice(WORDS).title()} {n:05d}',
+                total_tasks=tasks,
+                completed_tasks=sum(client_states),
+            )
+            for n, client_states in enumerate(states)
+        ])
+        if any(client.pk is None for client in user_clients):
+            user_clients = list(Client.objects.filter(user=user).order_by('pk'))
+
+        pending = []
+        for client, client_states in zip(user_clients, states):
+            for is_completed in client_states:
+                title = f'{rng.choice(WORDS).capitalize()} {rng.choice(WORDS)} #{rng.randrange(10000)}'
+                pending.append(Task(client=client, title=title, is_completed=is_completed))
+                if len(pending) >= batch_size:
+                    Task.objects.bulk_create(pending)
+                    pending = []
+        Task.objects.bulk_create(pending)
+
+        stats.append(UserStats(
+            user=user,
+            total_clients=clients,
+            total_tasks=clients * tasks,
+            completed_tasks=sum(map(sum, states)),
+        ))
+    UserStats.objects.bulk_create(stats)
+    return created_users
+
+
+def _measure(http, method, url, **extra):
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        response = getattr(http, method)(url, secure=True, **extra)
+        elapsed = time.perf_counter() - started
+    if response.status_code != 200:
+        raise RuntimeError(f'{method.upper()} {url} returned HTTP {response.status_code}')
+    return elapsed, len(queries), response
+
+
+def run_endpoint_benchmarks(user, repeat=20, seed=0):
+    """
+    Exercise each budgeted endpoint ``repeat`` times as ``user``. The dashboard
+    is requested with empty caches every time, so it is measured cold.
+    Returns one EndpointResult per endpoint.
+    """
+    rng = random.Random(seed)
+    http = HttpClient()
+    http.force_login(user)
+    client_ids = list(Client.objects.filter(user=user).values_list('pk', flat=True))
+    task_ids = list(Task.objects.filter(client__user=user).values_list('pk', flat=True)[:1000])
+    samples = {endpoint: ([], []) for endpoint in QUERY_BUDGETS}
+
+    def record(endpoint, method, url, **extra):
+        elapsed, queries, response = _measure(http, method, url, **extra)
+        samples[endpoint][0].append(elapsed)
+        samples[endpoint][1].append(queries)
+        return response
+
+    created = []
+    for n in range(repeat):
+        for alias in ('default', 'fragments'):
+            caches[alias].clear()
+        record('dashboard', 'get', '/')
+        record('task_toggle', 'post', f'/task/toggle/{rng.choice(task_ids)}/')
+        record('task_set_completed', 'post', f'/task/completed/{rng.choice(task_ids)}/',
+               data={'completed': rng.choice(['true', 'false'])})
+        response = record('task_create', 'post', f'/client/{rng.choice(client_ids)}/task/create/',
+                          data={'title': f'Benchmark task {n}'})
+        created.append(response.json()['task']['id'])
+        record('client_create', 'post', '/client/create/', data={'name': f'Benchmark client {seed}-{n}'})
+    for task_id in created:
+        record('task_delete', 'post', f'/task/delete/{task_id}/')
+
+    return [EndpointResult(endpoint, *samples[endpoint]) for endpoint in QUERY_BUDGETS]
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[max(0, round(len(values) * fraction) - 1)]
+
+
+def summarize(result):
+    """(p50 ms, p95 ms, max queries) for an EndpointResult"""
+    return (
+        statistics.median(result.latencies) * 1000,
+        percentile(result.latencies, 0.95) * 1000,
+        max(result.queries),
+    )
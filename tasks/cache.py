@@ -0,0 +1,64 @@
+"""
+Per-user, version-keyed cache for dashboard reads.
+
+Every mutation bumps ``UserStats.version`` in the same UPDATE that adjusts the
+user's counters (see tasks.counters), and cache keys embed that version. A write
+therefore invalidates everything cached for the user at once, in every process,
+without deleting keys: stale entries are never read again and simply expire.
+This only holds across workers when the configured cache is shared (file-based,
+Redis or Memcached), see CACHES in settings.
+
+The same version doubles as the HTTP validator for conditional GETs.
+"""
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import caches
+from django.utils.crypto import md5
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+from .counters import get_user_stats
+
+
+DEFAULT_TIMEOUT = 60 * 60  # 1 hour
+
+
+def _cache():
+    return caches[getattr(settings, 'TASKS_CACHE_ALIAS', 'default')]
+
+
+def user_cache_key(user_id, version, name):
+    return f'tasks:user:{user_id}:v{version}:{name}'
+
+
+def cached_for_user(user, name, build):
+    """Return ``build()`` for the user's current data version, computing it at most once per version"""
+    stats = get_user_stats(user)
+    key = user_cache_key(user.pk, stats.version, name)
+    cache = _cache()
+    value = cache.get(key)
+    if value is None:
+        value = build()
+        cache.set(key, value, getattr(settings, 'TASKS_CACHE_TIMEOUT', DEFAULT_TIMEOUT))
+    return value
+
+
+def user_data_etag(request, *args, **kwargs):
+    """
+    Validator for pages built only from the user's data: changes whenever the
+    user's version is bumped. Pending flash messages are rendered into the
+    page, so no validator is offered while any are queued; the CSRF cookie is
+    folded in because pages embed a token derived from it.
+    """
+    if not request.user.is_authenticated or len(get_messages(request)):
+        return None
+    stats = get_user_stats(request.user)
+    csrf_cookie = request.COOKIES.get(settings.CSRF_COOKIE_NAME, '')
+    salt = getattr(settings, 'TASKS_ETAG_SALT', '')
+    digest = md5(f'{salt}:{csrf_cookie}'.encode(), usedforsecurity=False).hexdigest()[:12]
+    return f'{request.user.pk}-{stats.version}-{digest}'
+
+
+def conditional_on_user_data(view_func):
+    """Answer If-None-Match with 304 while the user's data is unchanged; browsers must always revalidate"""
+    return cache_control(private=True, no_cache=True)(condition(etag_func=user_data_etag)(view_func))
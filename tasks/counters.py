@@ -0,0 +1,161 @@
+"""
+Maintenance of the denormalized task counters stored on Client and UserStats.
+
+Every Task/Client mutation applies a delta here with F() expressions, inside the
+same transaction as the mutation itself, so the counters never need a COUNT query
+to be read. Writes that bypass tasks.mutations, like the Django admin's, re-derive
+the affected counters with ``recount_client_owners`` instead. ``recompute_counters``
+rebuilds everything from the Task table and is what the ``recompute_counters``
+management command runs to repair drift. Archived tasks (TaskArchive) are all
+completed and still count towards both counters.
+"""
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from .models import Client, UserStats
+
+
+def get_user_stats(user):
+    """Return the user's stats row, creating it from the client counters on first use"""
+    try:
+        return user.task_stats
+    except UserStats.DoesNotExist:
+        stats = rebuild_user_stats(user.pk)
+        user.task_stats = stats
+        return stats
+
+
+def rebuild_user_stats(user_id):
+    """Recalculate a user's rollup from their clients' stored counters"""
+    totals = Client.objects.filter(user_id=user_id).aggregate(
+        clients=Count('id'),
+        total=Sum('total_tasks'),
+        completed=Sum('completed_tasks'),
+    )
+    values = {
+        'total_clients': totals['clients'] or 0,
+        'total_tasks': totals['total'] or 0,
+        'completed_tasks': totals['completed'] or 0,
+    }
+    updated = UserStats.objects.filter(user_id=user_id).update(version=F('version') + 1, **values)
+    if not updated:
+        UserStats.objects.get_or_create(user_id=user_id, defaults=values)
+    return UserStats.objects.get(user_id=user_id)
+
+
+def adjust_user_stats(user_id, clients=0, total=0, completed=0):
+    """
+    Apply a delta to the user's rollup and bump its cache version; must run
+    inside the mutating transaction. Every client/task mutation goes through here.
+    """
+    updated = UserStats.objects.filter(user_id=user_id).update(
+        version=F('version') + 1,
+        total_clients=F('total_clients') + clients,
+        total_tasks=F('total_tasks') + total,
+        completed_tasks=F('completed_tasks') + completed,
+    )
+    if not updated:
+        # No rollup yet: the client counters already include this delta
+        rebuild_user_stats(user_id)
+
+
+def adjust_task_counters(client, total=0, completed=0):
+    """
+    Apply a task delta to a client and its owner's rollup. Only a live client is
+    updated: after a concurrent delete_client() the UPDATE matches nothing, and the
+    rollup, which no longer includes the client's counters, is left alone.
+    """
+    updated = Client.objects.filter(pk=client.pk).update(
+        version=F('version') + 1,
+        total_tasks=F('total_tasks') + total,
+        completed_tasks=F('completed_tasks') + completed,
+    )
+    if updated:
+        adjust_user_stats(client.user_id, total=total, completed=completed)
+
+
+def adjust_clients_task_counters(deltas):
+    """
+    adjust_task_counters() for several clients without the rollup: ``deltas`` maps
+    client ids to (total, completed), each applied with its own F() UPDATE.
+    Returns the (total, completed) applied to clients still live, for the caller
+    to fold into the owner's rollup with adjust_user_stats().
+    """
+    applied_total = applied_completed = 0
+    for client_id, (total, completed) in deltas.items():
+        updated = Client.objects.filter(pk=client_id).update(
+            version=F('version') + 1,
+            total_tasks=F('total_tasks') + total,
+            completed_tasks=F('completed_tasks') + completed,
+        )
+        if updated:
+            applied_total += total
+            applied_completed += completed
+    return applied_total, applied_completed
+
+
+def bump_versions(client_ids):
+    """Invalidate the cached reads of the clients' owners without changing any counter"""
+    UserStats.objects.filter(user__clients__in=client_ids).update(version=F('version') + 1)
+
+
+def recount_clients(user_id, client_ids):
+    """
+    Re-derive the counters of the given clients from the Task table and fold the
+    change into the user's rollup. Used after set-based mutations whose per-client
+    deltas are not known up front; callers should hold row locks on the clients.
+    """
+    clients = list(Client.objects.filter(pk__in=client_ids).with_live_task_counts())
+    total_delta = completed_delta = 0
+    for client in clients:
+        total_delta += client.live_total_tasks - client.total_tasks
+        completed_delta += client.live_completed_tasks - client.completed_tasks
+        client.total_tasks = client.live_total_tasks
+        client.completed_tasks = client.live_completed_tasks
+        client.version = F('version') + 1
+    Client.objects.bulk_update(clients, ['total_tasks', 'completed_tasks', 'version'], batch_size=500)
+    adjust_user_stats(user_id, total=total_delta, completed=completed_delta)
+    return clients
+
+
+def recount_client_owners(client_ids):
+    """
+    recount_clients() for clients of any owners, e.g. after Task rows were written
+    directly; must run inside the writing transaction. Locks the clients.
+    """
+    owners = {}
+    clients = Client.objects.filter(pk__in=client_ids).select_for_update().order_by('pk')
+    for client_id, user_id in clients.values_list('pk', 'user_id'):
+        owners.setdefault(user_id, []).append(client_id)
+    for user_id, ids in owners.items():
+        recount_clients(user_id, ids)
+
+
+def recompute_counters(user_ids=None):
+    """
+    Rebuild client counters from the Task table and user rollups from the clients.
+    Each user is repaired in its own short transaction with their client rows locked,
+    so it is safe to run against live traffic. Returns (clients_fixed, users_rebuilt).
+    """
+    if user_ids is None:
+        user_ids = list(User.objects.order_by('pk').values_list('pk', flat=True))
+
+    clients_fixed = users_rebuilt = 0
+    for user_id in user_ids:
+        with transaction.atomic():
+            # Lock first: FOR UPDATE cannot be combined with the GROUP BY below
+            list(Client.objects.filter(user_id=user_id).select_for_update().values_list('pk', flat=True))
+            stale = []
+            for client in Client.objects.filter(user_id=user_id).with_live_task_counts():
+                if (client.total_tasks, client.completed_tasks) != (client.live_total_tasks, client.live_completed_tasks):
+                    client.total_tasks = client.live_total_tasks
+                    client.completed_tasks = client.live_completed_tasks
+                    client.version = F('version') + 1
+                    stale.append(client)
+            Client.objects.bulk_update(stale, ['total_tasks', 'completed_tasks', 'version'], batch_size=500)
+            rebuild_user_stats(user_id)
+        clients_fixed += len(stale)
+        users_rebuilt += 1
+
+    return clients_fixed, users_rebuilt
@@ -0,0 +1,79 @@
+"""
+Read path for the dashboard page.
+
+Client counters are stored columns (see tasks.counters), so the page itself is
+built from one query for the client headers regardless of how many clients a
+user has. Task rows are not part of the page: they are fetched per client, a
+keyset-paginated page at a time, when the client is expanded. Archived tasks
+(see tasks.archive) are paged the same way, only when asked for.
+"""
+from collections import namedtuple
+from datetime import datetime
+
+from django.db.models import Q
+from django.utils.encoding import force_str
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from .models import Client, Task, TaskArchive
+
+
+TaskRow = namedtuple('TaskRow', ['id', 'title', 'is_completed', 'created_at'])
+
+TASK_PAGE_SIZE = 50
+MAX_TASK_PAGE_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def load_dashboard_clients(user):
+    """Return the user's clients with just the columns the client headers need"""
+    return list(
+        Client.objects.filter(user=user).only('id', 'name', 'total_tasks', 'completed_tasks', 'version')
+    )
+
+
+def encode_cursor(row):
+    """Opaque cursor pointing just past ``row`` in (-created_at, -id) order"""
+    return urlsafe_base64_encode(f'{row.created_at.isoformat()}|{row.id}'.encode())
+
+
+def decode_cursor(cursor):
+    try:
+        created_at, task_id = force_str(urlsafe_base64_decode(cursor)).split('|')
+        return datetime.fromisoformat(created_at), int(task_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(cursor) from e
+
+
+def load_task_page(client, cursor=None, limit=TASK_PAGE_SIZE, archived=False):
+    """
+    Return (rows, next_cursor) for one page of a client's tasks, newest first,
+    or of its archived tasks with ``archived``. Pages are seeked on
+    (created_at, id) rather than offset, so every page costs the same however
+    deep the user scrolls.
+    """
+    model = TaskArchive if archived else Task
+    tasks = model.objects.filter(client=client).order_by('-created_at', '-id')
+    if cursor:
+        created_at, task_id = decode_cursor(cursor)
+        tasks = tasks.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=task_id)
+        )
+
+    if archived:
+        # Only completed tasks are archived
+        rows = [
+            TaskRow(task_id, title, True, created_at)
+            for task_id, title, created_at in tasks.values_list('id', 'title', 'created_at')[:limit + 1]
+        ]
+    else:
+        rows = [
+            TaskRow(*values)
+            for values in tasks.values_list('id', 'title', 'is_completed', 'created_at')[:limit + 1]
+        ]
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1])
+    return rows, None
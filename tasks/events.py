@@ -0,0 +1,174 @@
+"""
+Live change events for the dashboard, streamed to the browser as server-sent events.
+
+The mutation views publish a compact event per change (the affected task or
+client plus the fresh client and user-wide counters, tagged with the user's
+stats version). Publishing waits for the surrounding transaction to commit, so
+subscribers never see a change that was rolled back.
+
+Delivery goes through a broker chosen by TASKS_EVENTS_BROKER. ``LocalBroker``
+fans events out within one process, which is all a single ASGI worker needs.
+``RedisBroker`` relays them over a Redis channel so that every worker (and any
+WSGI process doing the writes) reaches every open stream.
+"""
+import asyncio
+import functools
+import json
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+
+QUEUE_SIZE = 100
+HEARTBEAT_SECONDS = 15
+# Streams are closed (and transparently reopened by EventSource) after this long,
+# which also bounds how long a stream abandoned by its client keeps a subscription
+MAX_STREAM_SECONDS = 5 * 60
+RETRY_MILLISECONDS = 3000
+
+# Sent instead of the backlog when a subscriber falls too far behind
+RESYNC = json.dumps({'type': 'resync'})
+
+
+class Subscription:
+    """One open stream's queue, fed from any thread via its event loop"""
+
+    def __init__(self, broker, user_id):
+        self.broker = broker
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+
+    def put(self, message):
+        # Runs on self.loop
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class LocalBroker:
+    """In-process pub/sub: reaches the streams served by this process only"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def publish(self, user_id, message):
+        self.dispatch(user_id, message)
+
+    def dispatch(self, user_id, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, message)
+            except RuntimeError:
+                # The stream's event loop has shut down
+                subscription.close()
+
+    def subscribe(self, user_id):
+        """Open a subscription; must be called from the event loop that will read it"""
+        subscription = Subscription(self, user_id)
+        with self._lock:
+            self._subscribers[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+
+class RedisBroker(LocalBroker):
+    """
+    Relays events through one Redis pub/sub channel. Each process runs a single
+    listener per event loop and hands what it receives to its local subscribers.
+    """
+
+    def __init__(self):
+        super().__init__()
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured('RedisBroker requires the redis package (pip install redis)')
+        self._redis = redis
+        self._url = settings.TASKS_EVENTS_REDIS_URL
+        self._channel = settings.TASKS_EVENTS_REDIS_CHANNEL
+        self._client = redis.Redis.from_url(self._url)
+        self._listeners = {}
+
+    def publish(self, user_id, message):
+        self._client.publish(self._channel, f'{user_id}:{message}')
+
+    def subscribe(self, user_id):
+        loop = asyncio.get_running_loop()
+        listener = self._listeners.get(loop)
+        if listener is None or listener.done():
+            self._listeners[loop] = loop.create_task(self._listen())
+        return super().subscribe(user_id)
+
+    async def _listen(self):
+        from redis import asyncio as aioredis
+
+        while True:
+            try:
+                client = aioredis.Redis.from_url(self._url)
+                async with client.pubsub(ignore_subscribe_messages=True) as pubsub:
+                    await pubsub.subscribe(self._channel)
+                    async for item in pubsub.listen():
+                        user_id, _, message = item['data'].decode().partition(':')
+                        self.dispatch(int(user_id), message)
+            except self._redis.ConnectionError:
+                # Streams keep their heartbeats meanwhile; retry until Redis is back
+                await asyncio.sleep(1)
+
+
+@functools.lru_cache(maxsize=None)
+def get_broker():
+    return import_string(settings.TASKS_EVENTS_BROKER)()
+
+
+def publish(user_id, event):
+    """Send ``event`` (a JSON-serializable dict with a ``type``) to the user's open streams once committed"""
+    message = json.dumps(event, separators=(',', ':'))
+    transaction.on_commit(functools.partial(get_broker().publish, user_id, message))
+
+
+async def event_stream(subscription, snapshot):
+    """
+    Yield SSE frames for an open subscription: the reconnect delay, the snapshot
+    event, then each published event, with comment heartbeats in between.
+    """
+    loop = asyncio.get_running_loop()
+    closes_at = loop.time() + MAX_STREAM_SECONDS
+    try:
+        yield f'retry: {RETRY_MILLISECONDS}\n\n'
+        yield f'data: {json.dumps(snapshot, separators=(",", ":"))}\n\n'
+        while True:
+            timeout = min(HEARTBEAT_SECONDS, closes_at - loop.time())
+            if timeout <= 0:
+                break
+            try:
+                message = await asyncio.wait_for(subscription.get(), timeout)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            yield f'data: {message}\n\n'
+    finally:
+        subscription.close()
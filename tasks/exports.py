@@ -0,0 +1,118 @@
+"""
+Streaming export of a user's clients and tasks as CSV or JSON lines.
+
+Both formats carry the same flat records, one per task, in client-name order::
+
+    client_id, client, task_id, title, is_completed, created_at, updated_at
+
+followed by the archived tasks, also in client-name order, and one record per
+client that has no tasks at all, with the task fields left empty (null in JSON
+lines). Tasks are read with ``iterator(chunk_size=...)`` and
+``select_related('client')``, so memory use does not grow with the account size.
+The same layout is accepted by the importer.
+"""
+import csv
+import json
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+
+from .models import Client, Task, TaskArchive
+
+
+EXPORT_FORMATS = {
+    # format: (content type, file extension)
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'jsonl': ('application/x-ndjson; charset=utf-8', 'jsonl'),
+}
+EXPORT_FIELDS = ['client_id', 'client', 'task_id', 'title', 'is_completed', 'created_at', 'updated_at']
+EXPORT_CHUNK_SIZE = 2000
+
+
+class _Echo:
+    """File-like object whose write() hands the formatted line back to csv.writer's caller"""
+
+    def write(self, value):
+        return value
+
+
+def _task_records(tasks, chunk_size, archived=False):
+    fields = ['id', 'title', 'created_at', 'updated_at', 'client__id', 'client__name']
+    if not archived:
+        fields.append('is_completed')
+    tasks = (
+        tasks.select_related('client')
+        .only(*fields)
+        .order_by('client__name', 'client_id', 'created_at', 'id')
+    )
+    for task in tasks.iterator(chunk_size=chunk_size):
+        yield {
+            'client_id': task.client.id,
+            'client': task.client.name,
+            'task_id': task.id,
+            'title': task.title,
+            'is_completed': True if archived else task.is_completed,
+            'created_at': task.created_at.isoformat(),
+            'updated_at': task.updated_at.isoformat(),
+        }
+
+
+def _records(user, client_ids=None, completed=None, chunk_size=EXPORT_CHUNK_SIZE):
+    tasks = Task.objects.filter(client__user=user, client__deleted_at__isnull=True)
+    archived = TaskArchive.objects.filter(client__user=user, client__deleted_at__isnull=True)
+    if client_ids:
+        tasks = tasks.filter(client_id__in=client_ids)
+        archived = archived.filter(client_id__in=client_ids)
+    if completed is not None:
+        tasks = tasks.filter(is_completed=completed)
+    yield from _task_records(tasks, chunk_size)
+    # Archived tasks are all completed
+    if completed is not False:
+        yield from _task_records(archived, chunk_size, archived=True)
+
+    # A completion filter selects tasks, so clients without any have nothing to show
+    if completed is None:
+        empty = Client.objects.filter(user=user, tasks__isnull=True, archived_tasks__isnull=True)
+        if client_ids:
+            empty = empty.filter(pk__in=client_ids)
+        for client_id, name in empty.values_list('id', 'name').iterator(chunk_size=chunk_size):
+            yield {**dict.fromkeys(EXPORT_FIELDS), 'client_id': client_id, 'client': name}
+
+
+def iter_export(user, fmt='csv', client_ids=None, completed=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield the export as text lines. ``client_ids`` limits it to those of the
+    user's clients, ``completed`` (True/False) to tasks in that state.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f'Unknown export format: {fmt!r}')
+    records = _records(user, client_ids, completed, chunk_size)
+    if fmt == 'jsonl':
+        for record in records:
+            yield json.dumps(record, ensure_ascii=False) + '\n'
+        return
+
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for record in records:
+        yield writer.writerow(['' if record[field] is None else record[field] for field in EXPORT_FIELDS])
+
+
+def chunked(lines, size=500):
+    """Join lines into larger blocks so a stream is not written one row at a time"""
+    lines = iter(lines)
+    while block := ''.join(islice(lines, size)):
+        yield block
+
+
+async def aiterate(iterator):
+    """
+    Drive a database-reading iterator from the event loop, one item per hop to the
+    request's sync thread. StreamingHttpResponse under ASGI would otherwise read a
+    sync iterator to the end before sending anything.
+    """
+    iterator = iter(iterator)
+    step = sync_to_async(next, thread_sensitive=True)
+    done = object()
+    while (item := await step(iterator, done)) is not done:
+        yield item
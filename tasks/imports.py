@@ -0,0 +1,201 @@
+"""
+Bulk import of clients and tasks from CSV or JSON lines.
+
+Records use the export layout (see tasks.exports): ``client`` is required,
+``title`` and ``is_completed`` are optional and any other field is ignored. A
+record without a title only makes sure the client exists. Client names are
+matched against the user's existing clients, so re-importing adds tasks to the
+same clients instead of failing on the (user, name) uniqueness constraint.
+
+Input is parsed as a stream and applied in batches. Each batch runs in its own
+transaction: one lookup resolves the batch's client names, missing clients and
+the tasks are inserted with bulk_create, existing clients get one F() delta each
+and the user's rollup one per batch. A batch that collides with a client created
+concurrently under the same name is retried once. An invalid record stops the
+import; batches before it stay committed and are reported.
+"""
+import csv
+import json
+import os
+from itertools import islice
+
+from django.db import IntegrityError, transaction
+
+from .counters import adjust_clients_task_counters, adjust_user_stats
+from .models import Client, Task
+
+
+IMPORT_FORMATS = ['csv', 'jsonl']
+IMPORT_BATCH_SIZE = 500
+
+CLIENT_NAME_MAX_LENGTH = Client._meta.get_field('name').max_length
+TASK_TITLE_MAX_LENGTH = Task._meta.get_field('title').max_length
+
+TRUE_VALUES = {'true', '1', 'yes', 'y'}
+FALSE_VALUES = {'false', '0', 'no', 'n', ''}
+
+FORMAT_BY_EXTENSION = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl'}
+FORMAT_BY_CONTENT_TYPE = {
+    'text/csv': 'csv',
+    'application/x-ndjson': 'jsonl',
+    'application/jsonl': 'jsonl',
+}
+
+
+class InvalidImport(ValueError):
+    pass
+
+
+def detect_format(filename=None, content_type=None):
+    """Guess the import format from a file name or a content type, or return None"""
+    if filename:
+        fmt = FORMAT_BY_EXTENSION.get(os.path.splitext(filename)[1].lower())
+        if fmt:
+            return fmt
+    return FORMAT_BY_CONTENT_TYPE.get(content_type)
+
+
+def _parse_completed(value, line):
+    if isinstance(value, bool):
+        return value
+    value = '' if value is None else str(value).strip().lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise InvalidImport(f'Line {line}: is_completed must be true or false')
+
+
+def _clean(record, line):
+    """Validate one record and return (client name, task title or '', is_completed)"""
+    if not isinstance(record, dict):
+        raise InvalidImport(f'Line {line}: expected an object')
+    name = str(record.get('client') or '').strip()
+    title = str(record.get('title') or '').strip()
+    if not name:
+        raise InvalidImport(f'Line {line}: client is required')
+    if len(name) > CLIENT_NAME_MAX_LENGTH:
+        raise InvalidImport(f'Line {line}: client name is longer than {CLIENT_NAME_MAX_LENGTH} characters')
+    if len(title) > TASK_TITLE_MAX_LENGTH:
+        raise InvalidImport(f'Line {line}: title is longer than {TASK_TITLE_MAX_LENGTH} characters')
+    return name, title, _parse_completed(record.get('is_completed'), line)
+
+
+def parse_records(lines, fmt):
+    """Yield cleaned (client, title, is_completed) rows from an iterable of text lines"""
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        if reader.fieldnames is None or 'client' not in reader.fieldnames:
+            raise InvalidImport('Line 1: the CSV header must include a client column')
+        for record in reader:
+            yield _clean(record, reader.line_num)
+    elif fmt == 'jsonl':
+        for line, text in enumerate(lines, start=1):
+            if not text.strip():
+                continue
+            try:
+                record = json.loads(text)
+            except ValueError:
+                raise InvalidImport(f'Line {line}: invalid JSON') from None
+            yield _clean(record, line)
+    else:
+        raise InvalidImport(f'Unknown import format: {fmt!r}')
+
+
+def _apply_batch(user, rows, dry_run, new_names):
+    """
+    Insert one batch; returns (clients created, tasks created). ``new_names``
+    collects the clients a dry run would have created, so later batches of the
+    same run treat them as existing.
+    """
+    names = {name for name, _, _ in rows}
+    tasks_by_name = {}
+    for name, title, is_completed in rows:
+        if title:
+            tasks_by_name.setdefault(name, []).append((title, is_completed))
+
+    if dry_run:
+        existing = set(Client.objects.filter(user=user, name__in=names).values_list('name', flat=True))
+        created = names - existing - new_names
+        new_names |= created
+        return len(created), sum(len(tasks) for tasks in tasks_by_name.values())
+
+    with transaction.atomic():
+        clients = {
+            client.name: client
+            for client in Client.objects.filter(user=user, name__in=names).only('id', 'name', 'user_id')
+        }
+        missing = [
+            Client(
+                user=user,
+                name=name,
+                total_tasks=len(tasks_by_name.get(name, ())),
+                completed_tasks=sum(done for _, done in tasks_by_name.get(name, ())),
+            )
+            for name in sorted(names - clients.keys())
+        ]
+        created_clients = Client.objects.bulk_create(missing)
+        if any(client.pk is None for client in created_clients):
+            # Backends that cannot return ids from a bulk insert
+            created_clients = list(Client.objects.filter(user=user, name__in=[c.name for c in missing]))
+
+        # New clients were inserted with their counters; existing ones get deltas
+        deltas = {
+            client.pk: (len(tasks_by_name[name]), sum(done for _, done in tasks_by_name[name]))
+            for name, client in clients.items()
+            if name in tasks_by_name
+        }
+        clients.update((client.name, client) for client in created_clients)
+
+        tasks = [
+            Task(client=clients[name], title=title, is_completed=is_completed)
+            for name, client_tasks in tasks_by_name.items()
+            for title, is_completed in client_tasks
+        ]
+        Task.objects.bulk_create(tasks, batch_size=IMPORT_BATCH_SIZE)
+        total, completed = adjust_clients_task_counters(deltas)
+        adjust_user_stats(
+            user.pk,
+            clients=len(created_clients),
+            total=total + sum(client.total_tasks for client in created_clients),
+            completed=completed + sum(client.completed_tasks for client in created_clients),
+        )
+    return len(created_clients), len(tasks)
+
+
+def _apply_batch_with_retry(user, rows, dry_run, new_names):
+    try:
+        return _apply_batch(user, rows, dry_run, new_names)
+    except IntegrityError:
+        # Another request created one of the batch's clients in the meantime; the
+        # retry finds it and adds the tasks to it
+        pass
+    try:
+        return _apply_batch(user, rows, dry_run, new_names)
+    except IntegrityError:
+        raise InvalidImport('Clients in this batch were being created concurrently; retry the import') from None
+
+
+def import_records(user, lines, fmt, batch_size=IMPORT_BATCH_SIZE, dry_run=False, progress=None):
+    """
+    Import ``lines`` (an iterable of text lines in ``fmt``) for ``user``. Returns
+    the totals as a dict of rows, batches, clients_created and tasks_created.
+    ``progress`` is called with the running totals after every batch. Raises
+    InvalidImport at the first bad record, with the totals so far on ``.result``.
+    """
+    result = {'rows': 0, 'batches': 0, 'clients_created': 0, 'tasks_created': 0}
+    rows = parse_records(lines, fmt)
+    new_names = set()
+    try:
+        while batch := list(islice(rows, batch_size)):
+            clients_created, tasks_created = _apply_batch_with_retry(user, batch, dry_run, new_names)
+            result['rows'] += len(batch)
+            result['batches'] += 1
+            result['clients_created'] += clients_created
+            result['tasks_created'] += tasks_created
+            if progress is not None:
+                progress(result)
+    except InvalidImport as e:
+        e.result = result
+        raise
+    return result
@@ -0,0 +1,49 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from tasks.archive import ARCHIVE_BATCH_SIZE, archivable_tasks, archive_batch
+
+
+class Command(BaseCommand):
+    help = (
+        'Moves completed tasks not updated for --days days from the Task table to the archive, '
+        'in batches that are safe to run alongside live traffic. Re-run to resume an interrupted run.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=90, help='Archive tasks completed before this many days ago (default 90)')
+        parser.add_argument(
+            '--batch-size', type=int, default=ARCHIVE_BATCH_SIZE,
+            help=f'Tasks moved per transaction (default {ARCHIVE_BATCH_SIZE})',
+        )
+        parser.add_argument('--sleep', type=float, default=0, help='Seconds to pause between batches (default 0)')
+        parser.add_argument('--max-batches', type=int, help='Stop after this many batches')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the tasks that would be archived')
+
+    def handle(self, *args, **options):
+        if options['days'] < 0:
+            raise CommandError('--days must not be negative')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        cutoff = timezone.now() - timedelta(days=options['days'])
+
+        if options['dry_run']:
+            self.stdout.write(f'Tasks to archive: {archivable_tasks(cutoff).count()}')
+            return
+
+        archived = batches = 0
+        last_id = 0
+        while options['max_batches'] is None or batches < options['max_batches']:
+            moved, last_id = archive_batch(cutoff, last_id, options['batch_size'])
+            if last_id is None:
+                break
+            archived += moved
+            batches += 1
+            self.stdout.write(f'Batch {batches}: {moved} tasks archived (up to task id {last_id})')
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f'Archived {archived} tasks in {batches} batches'))
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.benchmarks import (
+    QUERY_BUDGETS, benchmark_database, generate_dataset, parse_size, run_endpoint_benchmarks, summarize,
+)
+
+
+DEFAULT_SIZES = ['1x10x10', '3x50x100', '3x200x250']
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures latency and query counts of the main endpoints at several dataset sizes, '
+        'against a throwaway test database. Fails if any request exceeds its query budget.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--size', action='append', dest='sizes',
+            help=f"Dataset size as users x clients x tasks, e.g. 3x50x100 (may be given more than once; "
+                 f"default {' '.join(DEFAULT_SIZES)})",
+        )
+        parser.add_argument('--repeat', type=int, default=20, help='Requests per endpoint and size (default 20)')
+        parser.add_argument('--seed', type=int, default=0, help='Seed for the generated data (default 0)')
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [parse_size(size) for size in options['sizes'] or DEFAULT_SIZES]
+        except ValueError as e:
+            raise CommandError(e)
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1')
+
+        failures = []
+        with benchmark_database():
+            self.stdout.write(f"{'dataset':<12} {'endpoint':<18} {'p50 ms':>8} {'p95 ms':>8} {'queries':>8} {'budget':>7}")
+            for size in sizes:
+                label = f'{size.users}x{size.clients}x{size.tasks}'
+                # Each size gets its own users; the other sizes' rows stay in the tables as background data
+                users = generate_dataset(*size, seed=options['seed'], prefix=f'bench{label}')
+                for result in run_endpoint_benchmarks(users[0], options['repeat'], options['seed']):
+                    p50, p95, queries = summarize(result)
+                    budget = QUERY_BUDGETS[result.endpoint]
+                    line = f'{label:<12} {result.endpoint:<18} {p50:8.1f} {p95:8.1f} {queries:8d} {budget:7d}'
+                    if queries > budget:
+                        failures.append(f'{label} {result.endpoint}: {queries} queries, budget {budget}')
+                        line = self.style.ERROR(line + '  OVER BUDGET')
+                    self.stdout.write(line)
+
+        if failures:
+            raise CommandError('Query budget exceeded:\n' + '\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS('All endpoints are within their query budgets'))
@@ -0,0 +1,115 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import ModuleType
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client as HttpClient
+from django.test.utils import override_settings
+from django.urls import path
+from django.utils.module_loading import import_string
+
+from tasks import async_views, views
+from tasks.benchmarks import benchmark_database, percentile
+from tasks.models import Client, Task
+from tasks.staticfiles import async_middleware
+
+
+def _urlconf(view):
+    """A one-route URLconf, so each run hits exactly the view being measured"""
+    module = ModuleType(f'benchmark_toggle_{view.__module__.replace(".", "_")}')
+    module.urlpatterns = [path('task/toggle/<int:pk>/', view, name='task_toggle')]
+    return module
+
+
+def _sync_only(middleware):
+    """Middleware that would make Django run an ASGI request's whole chain in a thread"""
+    return [name for name in middleware if not getattr(import_string(name), 'async_capable', False)]
+
+
+def _summary(label, latencies, elapsed):
+    return (
+        f'{label:<12} {len(latencies) / elapsed:8.1f} req/s   '
+        f'p50 {percentile(latencies, 0.5) * 1000:7.1f} ms   p95 {percentile(latencies, 0.95) * 1000:7.1f} ms'
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares toggle throughput of the sync view under WSGI against the async view under ASGI. '
+        'Runs against a throwaway test database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Toggle requests per run (default 500)')
+        parser.add_argument('--concurrency', type=int, default=20, help='Requests in flight at once (default 20)')
+        parser.add_argument('--tasks', type=int, default=50, help='Tasks to spread the toggles over (default 50)')
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            user = User.objects.create_user('benchmark', password='benchmark')
+            client = Client.objects.create(user=user, name='Benchmark')
+            Task.objects.bulk_create([Task(client=client, title=f'Task {i}') for i in range(options['tasks'])])
+            task_ids = list(Task.objects.filter(client=client).values_list('pk', flat=True))
+            urls = [f'/task/toggle/{task_ids[i % len(task_ids)]}/' for i in range(options['requests'])]
+
+            login = HttpClient()
+            login.force_login(user)
+            cookies = login.cookies
+
+            with override_settings(ROOT_URLCONF=_urlconf(views.task_toggle)):
+                self.stdout.write(_summary('sync/WSGI', *self._run_sync(urls, cookies, options['concurrency'])))
+            # The middleware taskmanager.asgi runs with (ASYNC_VIEWS on)
+            middleware = async_middleware(settings.MIDDLEWARE)
+            with override_settings(ROOT_URLCONF=_urlconf(async_views.task_toggle), MIDDLEWARE=middleware):
+                self.stdout.write(_summary('async/ASGI', *self._run_async(urls, cookies, options['concurrency'])))
+            self.stdout.write(f'Sync-only middleware under ASGI: {", ".join(_sync_only(middleware)) or "none"}')
+
+    def _run_sync(self, urls, cookies, concurrency):
+        """WSGI handler on a thread pool: each in-flight request holds a thread"""
+        def worker(chunk):
+            http = HttpClient()
+            http.cookies = cookies
+            latencies = []
+            try:
+                for url in chunk:
+                    started = time.perf_counter()
+                    response = http.post(url, secure=True)
+                    latencies.append(time.perf_counter() - started)
+                    self._check(response)
+            finally:
+                connections.close_all()
+            return latencies
+
+        chunks = [urls[i::concurrency] for i in range(concurrency)]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = [latency for result in pool.map(worker, chunks) for latency in result]
+        return latencies, time.perf_counter() - started
+
+    def _run_async(self, urls, cookies, concurrency):
+        """ASGI handler on one event loop: requests only hold a thread while querying"""
+        async def run():
+            http = AsyncClient()
+            http.cookies = cookies
+            gate = asyncio.Semaphore(concurrency)
+
+            async def one(url):
+                async with gate:
+                    started = time.perf_counter()
+                    response = await http.post(url, secure=True)
+                    self._check(response)
+                    return time.perf_counter() - started
+
+            started = time.perf_counter()
+            latencies = await asyncio.gather(*(one(url) for url in urls))
+            return latencies, time.perf_counter() - started
+
+        return asyncio.run(run())
+
+    def _check(self, response):
+        if response.status_code != 200:
+            raise CommandError(f'Toggle returned HTTP {response.status_code}')
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.backends import find_user
+from tasks.exports import EXPORT_FORMATS, chunked, iter_export
+
+
+class Command(BaseCommand):
+    help = "Streams a user's clients and tasks as CSV or JSON lines (see tasks.exports)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('user', help='Username or email address of the account to export')
+        parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='csv')
+        parser.add_argument(
+            '--client', type=int, action='append', dest='client_ids',
+            help='Only export this client id (may be given more than once)',
+        )
+        completed = parser.add_mutually_exclusive_group()
+        completed.add_argument('--completed', action='store_const', const=True, dest='completed',
+                               help='Only export completed tasks')
+        completed.add_argument('--pending', action='store_const', const=False, dest='completed',
+                               help='Only export pending tasks')
+        parser.add_argument('--output', '-o', help='Write to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        user = find_user(options['user'])
+        if user is None:
+            raise CommandError(f"No user matches {options['user']!r}")
+
+        blocks = chunked(iter_export(user, options['format'], options['client_ids'], options['completed']))
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+                output.writelines(blocks)
+            self.stderr.write(self.style.SUCCESS(f"Exported {user.get_username()} to {options['output']}"))
+        else:
+            for block in blocks:
+                self.stdout.write(block, ending='')
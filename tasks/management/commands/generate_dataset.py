@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.benchmarks import generate_dataset, parse_size
+
+
+class Command(BaseCommand):
+    help = 'Fills the database with synthetic users, clients and tasks for local load and benchmark runs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('size', help='Dataset size as users x clients per user x tasks per client, e.g. 5x100x50')
+        parser.add_argument('--seed', type=int, default=0, help='Seed for the generated data (default 0)')
+        parser.add_argument('--prefix', default='demo', help="Username prefix and password (default 'demo')")
+        parser.add_argument('--completed-ratio', type=float, default=0.5, help='Share of completed tasks (default 0.5)')
+
+    def handle(self, *args, **options):
+        try:
+            size = parse_size(options['size'])
+        except ValueError as e:
+            raise CommandError(e)
+
+        users = generate_dataset(
+            *size, seed=options['seed'], prefix=options['prefix'], completed_ratio=options['completed_ratio'],
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {len(users)} users, {size.users * size.clients} clients '
+            f'and {size.users * size.clients * size.tasks} tasks'
+        ))
+        self.stdout.write(f"Log in as {users[0].username} with password {options['prefix']}")
@@ -0,0 +1,56 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.backends import find_user
+from tasks.imports import IMPORT_BATCH_SIZE, IMPORT_FORMATS, InvalidImport, detect_format, import_records
+
+
+class Command(BaseCommand):
+    help = 'Bulk-creates clients and tasks for a user from CSV or JSON lines (see tasks.imports)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('user', help='Username or email address of the account to import into')
+        parser.add_argument('path', help="File to import, or '-' for stdin")
+        parser.add_argument('--format', choices=IMPORT_FORMATS, help='Defaults to the file extension')
+        parser.add_argument(
+            '--batch-size', type=int, default=IMPORT_BATCH_SIZE,
+            help=f'Rows per transaction (default {IMPORT_BATCH_SIZE})',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Validate and count without writing anything')
+
+    def handle(self, *args, **options):
+        user = find_user(options['user'])
+        if user is None:
+            raise CommandError(f"No user matches {options['user']!r}")
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        fmt = options['format'] or detect_format(options['path'])
+        if fmt is None:
+            raise CommandError('Cannot tell the format from the file name; pass --format')
+
+        def progress(result):
+            self.stdout.write(
+                f"Batch {result['batches']}: {result['rows']} rows, "
+                f"{result['clients_created']} clients and {result['tasks_created']} tasks created"
+            )
+
+        source = sys.stdin if options['path'] == '-' else open(options['path'], encoding='utf-8-sig', newline='')
+        try:
+            result = import_records(
+                user, source, fmt,
+                batch_size=options['batch_size'],
+                dry_run=options['dry_run'],
+                progress=progress,
+            )
+        except InvalidImport as e:
+            raise CommandError(f"{e} ({e.result['rows']} rows imported before it)")
+        finally:
+            if source is not sys.stdin:
+                source.close()
+
+        prefix = 'Dry run: would have imported' if options['dry_run'] else 'Imported'
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix} {result['rows']} rows: {result['clients_created']} new clients, "
+            f"{result['tasks_created']} tasks"
+        ))
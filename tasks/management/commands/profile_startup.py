@@ -0,0 +1,53 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.startup import group_import_times, measure_startup, profile_imports, summarize_startup
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures cold starts in fresh interpreters: time to import the settings, run django.setup() '
+        'and serve a first request, with an import-time breakdown per app and module.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='/login/', help='Path of the first request (default /login/)')
+        parser.add_argument('--host', default='localhost', help='Host header of the first request (default localhost)')
+        parser.add_argument('--repeat', type=int, default=5, help='Cold starts to time per mode (default 5)')
+        parser.add_argument('--top', type=int, default=15, help='Apps/packages and modules to list (default 15)')
+        mode = parser.add_mutually_exclusive_group()
+        mode.add_argument('--lean', action='store_true', help='Profile with DJANGO_LEAN_STARTUP=True')
+        mode.add_argument('--compare', action='store_true', help='Time the default and the lean startup side by side')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1')
+        url, host = options['url'], options['host']
+
+        try:
+            modes = (False, True) if options['compare'] else (options['lean'],)
+            results = measure_startup(url, host, modes, options['repeat'])
+            records = profile_imports(url, host, options['lean'])
+        except RuntimeError as e:
+            raise CommandError(e)
+
+        self.stdout.write(f'Median of {options["repeat"]} cold starts, first request GET {url}')
+        self.stdout.write(f"{'mode':<8} {'settings':>9} {'setup':>9} {'request':>9} {'total':>9} {'modules':>8} {'status':>7}")
+        for lean, timings in results.items():
+            ms = summarize_startup(timings)
+            self.stdout.write(
+                f"{'lean' if lean else 'default':<8} {ms['settings']:9.1f} {ms['setup']:9.1f} "
+                f"{ms['first_request']:9.1f} {ms['total']:9.1f} {timings[-1].modules:8d} {timings[-1].status:7d}"
+            )
+
+        total = sum(record.self for record in records)
+        self.stdout.write('')
+        self.stdout.write(f"Import time by app or package ({'lean' if options['lean'] else 'default'} startup, "
+                          f"{total / 1000:.1f} ms in {len(records)} modules)")
+        for group, own, count in group_import_times(records, [config.name for config in apps.get_app_configs()])[:options['top']]:
+            self.stdout.write(f'{own / 1000:9.1f} ms {count:5d} modules  {group}')
+
+        self.stdout.write('')
+        self.stdout.write('Slowest modules (self / cumulative ms)')
+        for record in sorted(records, key=lambda r: -r.self)[:options['top']]:
+            self.stdout.write(f'{record.self / 1000:9.1f} {record.cumulative / 1000:9.1f}  {record.module}')
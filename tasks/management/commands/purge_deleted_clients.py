@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from tasks.purge import PURGE_CHUNK_SIZE, purge_deleted_clients
+
+
+class Command(BaseCommand):
+    help = (
+        'Removes deleted clients and their tasks in small chunks. '
+        'Run it periodically, or keep it running as a worker with --loop.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=PURGE_CHUNK_SIZE,
+            help=f'Tasks removed per DELETE statement (default {PURGE_CHUNK_SIZE})',
+        )
+        parser.add_argument('--sleep', type=float, default=0, help='Seconds to pause between chunks (default 0)')
+        parser.add_argument(
+            '--loop', type=float, metavar='SECONDS',
+            help='Keep running, checking for newly deleted clients every SECONDS seconds',
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1')
+        if options['loop'] is not None and options['loop'] <= 0:
+            raise CommandError('--loop must be a positive number of seconds')
+
+        def progress(client_id, removed):
+            self.stdout.write(f'Client {client_id}: {removed} tasks removed')
+
+        while True:
+            purged = purge_deleted_clients(options['chunk_size'], options['sleep'], progress)
+            if options['loop'] is None:
+                break
+            if purged:
+                self.stdout.write(f'Purged {purged} clients')
+            # A long-running worker must not hold on to a connection the database has dropped
+            close_old_connections()
+            time.sleep(options['loop'])
+
+        self.stdout.write(self.style.SUCCESS(f'Purged {purged} clients'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from tasks.search import install_search_index
+
+
+class Command(BaseCommand):
+    help = 'Recreates the client/task search index and its sync triggers, then reindexes all rows'
+
+    def handle(self, *args, **options):
+        with connection.schema_editor() as schema_editor:
+            install_search_index(schema_editor)
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully rebuilt the search index ({connection.vendor})'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from tasks.counters import recompute_counters
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the stored client task counters and per-user stats from the Task table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', dest='user_ids',
+            help='Only repair this user id (may be given more than once)',
+        )
+
+    def handle(self, *args, **options):
+        clients_fixed, users_rebuilt = recompute_counters(options['user_ids'])
+
+        self.stdout.write(self.style.SUCCESS('Successfully recomputed task counters'))
+        self.stdout.write(f'Clients corrected: {clients_fixed}')
+        self.stdout.write(f'Users rebuilt: {users_rebuilt}')
@@ -0,0 +1,168 @@
+"""
+Per-request timing collection and latency histograms, rendered for Prometheus.
+
+tasks.middleware.PerformanceMiddleware opens a RequestTimings for each request
+in a context variable. Two hooks add to it while the request runs: a database
+execute wrapper installed on every connection (context variables follow the
+request through sync_to_async, so queries issued from async views and the async
+ORM are counted too), and TimedDjangoTemplates, a DjangoTemplates backend that
+times each template render. When the request finishes, its wall, database and
+template times go into per-view histograms keyed by URL name.
+
+Histograms live in process memory: with several workers, each one exposes its
+own, and Prometheus sums them across scrape targets.
+"""
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import DjangoTemplates, Template as DjangoTemplate
+
+
+# Upper bounds in seconds, as in the Prometheus client defaults
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+
+HISTOGRAMS = {
+    # name: help text
+    'goalgrid_request_duration_seconds': 'Wall time spent in the view and middleware',
+    'goalgrid_request_db_duration_seconds': 'Time spent executing database queries',
+    'goalgrid_request_template_duration_seconds': 'Time spent rendering templates',
+}
+
+_current = ContextVar('goalgrid_request_timings', default=None)
+
+
+class RequestTimings:
+    __slots__ = ('started', 'queries', 'db_time', 'template_time')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+
+
+def start_request():
+    """Begin collecting for the current request; returns (timings, token for finish_request)"""
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def finish_request(token):
+    _current.reset(token)
+
+
+def _time_query(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.db_time += time.perf_counter() - started
+        timings.queries += 1
+
+
+def _install_query_timer(sender=None, connection=None, **kwargs):
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+def install_query_timer():
+    """Add the timing execute wrapper to every database connection, now and in the future"""
+    connection_created.connect(_install_query_timer, dispatch_uid='goalgrid_query_timer')
+    for connection in connections.all(initialized_only=True):
+        _install_query_timer(connection=connection)
+
+
+class TimedTemplate(DjangoTemplate):
+    def render(self, context=None, request=None):
+        timings = _current.get()
+        if timings is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            timings.template_time += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """DjangoTemplates backend whose templates report their render time to the current request"""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
+
+
+class Histogram:
+    __slots__ = ('counts', 'sum')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # The last slot is +Inf
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+
+
+class Registry:
+    """Thread-safe per-view histograms plus a query counter"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._queries = {}
+
+    def record(self, view, timings, duration):
+        samples = (duration, timings.db_time, timings.template_time)
+        with self._lock:
+            for name, value in zip(HISTOGRAMS, samples):
+                histogram = self._histograms.get((name, view))
+                if histogram is None:
+                    histogram = self._histograms[(name, view)] = Histogram()
+                histogram.observe(value)
+            self._queries[view] = self._queries.get(view, 0) + timings.queries
+
+    def render(self):
+        """The collected metrics in the Prometheus text exposition format"""
+        with self._lock:
+            histograms = {key: (list(h.counts), h.sum) for key, h in self._histograms.items()}
+            queries = dict(self._queries)
+
+        lines = []
+        for name, help_text in HISTOGRAMS.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} histogram')
+            for (metric, view), (counts, total) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                label = _escape(view)
+                cumulative = 0
+                for bound, count in zip(BUCKETS, counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{view="{label}",le="{bound}"}} {cumulative}')
+                cumulative += counts[-1]
+                lines.append(f'{name}_bucket{{view="{label}",le="+Inf"}} {cumulative}')
+                lines.append(f'{name}_sum{{view="{label}"}} {total}')
+                lines.append(f'{name}_count{{view="{label}"}} {cumulative}')
+        lines.append('# HELP goalgrid_request_db_queries_total Database queries executed')
+        lines.append('# TYPE goalgrid_request_db_queries_total counter')
+        for view, count in sorted(queries.items()):
+            lines.append(f'goalgrid_request_db_queries_total{{view="{_escape(view)}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = Registry()
@@ -0,0 +1,121 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.sessions.middleware import SessionMiddleware as DjangoSessionMiddleware
+
+from . import replicas
+from .metrics import finish_request, install_query_timer, registry, start_request
+
+
+class SessionMiddleware(DjangoSessionMiddleware):
+    """
+    Drop-in replacement for Django's SessionMiddleware, used instead of
+    SESSION_SAVE_EVERY_REQUEST: a session that was read but not modified is
+    saved (and its cookie re-issued) only when tasks.sessions says its expiry
+    is due for a refresh.
+    """
+
+    def process_response(self, request, response):
+        session = getattr(request, 'session', None)
+        if (
+            session is not None
+            and session.accessed
+            and not session.modified
+            and not session.is_empty()
+            and hasattr(session, 'needs_refresh')
+            and session.needs_refresh()
+        ):
+            session.modified = True
+        return super().process_response(request, response)
+
+
+class PerformanceMiddleware:
+    """
+    Records each request's wall time, query count, database time and template
+    time (see tasks.metrics) into per-view histograms, and reports them in a
+    Server-Timing header when TASKS_SERVER_TIMING is on (by default only with
+    DEBUG). Should be listed right after WhiteNoise, so that the timings cover the
+    rest of the middleware while static file hits stay out of the histograms.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.server_timing = settings.TASKS_SERVER_TIMING
+        install_query_timer()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings, token = start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            finish_request(token)
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        timings, token = start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            finish_request(token)
+        return self.finish(request, response, timings)
+
+    def finish(self, request, response, timings):
+        duration = time.perf_counter() - timings.started
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name if match else None) or 'unmatched'
+        registry.record(view, timings, duration)
+
+        if self.server_timing:
+            response['Server-Timing'] = (
+                f'db;dur={timings.db_time * 1000:.1f};desc="{timings.queries} queries", '
+                f'tpl;dur={timings.template_time * 1000:.1f}, '
+                f'total;dur={duration * 1000:.1f}'
+            )
+        return response
+
+
+class ReplicaMiddleware:
+    """
+    Decides which database the request reads from (see tasks.replicas) and,
+    when the request wrote, pins the browser's reads to the primary for a few
+    seconds. Should be listed before SessionMiddleware, so that a session saved
+    on the way out counts as a write.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        replicas.install_write_detector()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state, token = replicas.start_request(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            replicas.finish_request(token)
+        return self.finish(response, state)
+
+    async def __acall__(self, request):
+        state, token = replicas.start_request(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            replicas.finish_request(token)
+        return self.finish(response, state)
+
+    def finish(self, response, state):
+        if state.wrote and settings.TASKS_READ_REPLICAS:
+            replicas.pin_to_primary(response)
+        return response
@@ -0,0 +1,75 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:54
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_counters(apps, schema_editor):
+    Client = apps.get_model('tasks', 'Client')
+    UserStats = apps.get_model('tasks', 'UserStats')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+
+    clients = Client.objects.annotate(
+        live_total=models.Count('tasks'),
+        live_completed=models.Count('tasks', filter=models.Q(tasks__is_completed=True)),
+    )
+    for client in clients.iterator():
+        client.total_tasks = client.live_total
+        client.completed_tasks = client.live_completed
+        client.save(update_fields=['total_tasks', 'completed_tasks'])
+
+    totals = {
+        row['user_id']: row
+        for row in Client.objects.values('user_id').annotate(
+            clients=models.Count('id'),
+            total=models.Sum('total_tasks'),
+            completed=models.Sum('completed_tasks'),
+        )
+    }
+    UserStats.objects.bulk_create([
+        UserStats(
+            user_id=user_id,
+            total_clients=totals.get(user_id, {}).get('clients') or 0,
+            total_tasks=totals.get(user_id, {}).get('total') or 0,
+            completed_tasks=totals.get(user_id, {}).get('completed') or 0,
+        )
+        for user_id in User.objects.values_list('id', flat=True)
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tasks', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='completed_tasks',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='total_tasks',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_clients', models.PositiveIntegerField(default=0)),
+                ('total_tasks', models.PositiveIntegerField(default=0)),
+                ('completed_tasks', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='task_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'user stats',
+                'verbose_name_plural': 'user stats',
+            },
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
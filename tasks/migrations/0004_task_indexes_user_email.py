@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+USER_EMAIL_INDEX = models.Index(fields=['email'], name='tasks_user_email_idx')
+
+
+def add_user_email_index(apps, schema_editor):
+    # auth.User belongs to another app, so its index is managed by hand
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    schema_editor.add_index(User, USER_EMAIL_INDEX)
+
+
+def remove_user_email_index(apps, schema_editor):
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    schema_editor.remove_index(User, USER_EMAIL_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tasks', '0003_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['client', 'is_completed'], name='task_client_completed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['client', '-created_at', '-id'], name='task_client_recent_idx'),
+        ),
+        migrations.RunPython(add_user_email_index, remove_user_email_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0004_task_indexes_user_email'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:19
+
+from django.db import migrations, models
+
+from tasks.migrations._search_index import install_search_index
+
+
+def reinstall_search_index(apps, schema_editor):
+    # SQLite rebuilds tasks_client to change its constraints, dropping the FTS triggers
+    install_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0007_task_archive'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='client',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', False)), fields=['deleted_at'], name='client_deleted_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='client',
+            constraint=models.UniqueConstraint(condition=models.Q(('deleted_at__isnull', True)), fields=('user', 'name'), name='client_unique_live_name'),
+        ),
+        migrations.RunPython(reinstall_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:21
+
+from django.db import migrations, models
+
+from tasks.migrations._search_index import install_search_index
+
+
+def reinstall_search_index(apps, schema_editor):
+    # SQLite rebuilds tasks_client to add a column with a default, dropping the FTS triggers
+    install_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0008_client_soft_delete'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.RunPython(reinstall_search_index, migrations.RunPython.noop),
+    ]
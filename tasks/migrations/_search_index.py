@@ -0,0 +1,66 @@
+"""
+The search index DDL as migration 0003 created it, for migrations only.
+
+Migrations that already ran must keep doing the same thing, so this is a frozen
+copy of what tasks.search installed at the time; do not change it along with
+tasks.search. A later change to the index gets a new migration with its own SQL
+(and, if later migrations need it, a new frozen module next to this one).
+The loader skips this module because its name starts with an underscore.
+"""
+
+
+SQLITE_INDEXED_COLUMNS = [
+    # (table, column)
+    ('tasks_client', 'name'),
+    ('tasks_task', 'title'),
+]
+
+
+def _sqlite_index_sql(table, column):
+    fts = f'{table}_fts'
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({column}, content='{table}', content_rowid='id')",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+            INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+            INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {column} ON {table} BEGIN
+            INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column});
+            INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column});
+        END""",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+POSTGRESQL_INDEX_SQL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS tasks_client_name_trgm ON tasks_client USING gin (name gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS tasks_task_title_trgm ON tasks_task USING gin (title gin_trgm_ops)',
+]
+
+
+def install_search_index(schema_editor):
+    """Create the search index, or put back the SQLite triggers a table rebuild dropped"""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        statements = [sql for table, column in SQLITE_INDEXED_COLUMNS for sql in _sqlite_index_sql(table, column)]
+    elif vendor == 'postgresql':
+        statements = POSTGRESQL_INDEX_SQL
+    else:
+        return
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def drop_search_index(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for table, _ in SQLITE_INDEXED_COLUMNS:
+            for suffix in ('ai', 'ad', 'au'):
+                schema_editor.execute(f'DROP TRIGGER IF EXISTS {table}_fts_{suffix}')
+            schema_editor.execute(f'DROP TABLE IF EXISTS {table}_fts')
+    elif vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS tasks_client_name_trgm')
+        schema_editor.execute('DROP INDEX IF EXISTS tasks_task_title_trgm')
@@ -1,32 +1,68 @@
 from django.db import models
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
 
 
+class ClientQuerySet(models.QuerySet):
+    def with_live_task_counts(self):
+        """
+        Annotate each client with task counts computed from the Task table plus
+        its archived tasks, which are all completed
+        """
+        archived = Coalesce(Subquery(
+            TaskArchive.objects.filter(client=OuterRef('pk'))
+            .order_by().values('client').annotate(count=Count('*')).values('count')
+        ), 0)
+        return self.annotate(
+            live_total_tasks=Count('tasks') + archived,
+            live_completed_tasks=Count('tasks', filter=Q(tasks__is_completed=True)) + archived,
+        )
+
+
+class LiveClientManager(models.Manager.from_queryset(ClientQuerySet)):
+    """Hides soft-deleted clients, which only wait for ``purge_deleted_clients``"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class Client(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='clients')
     name = models.CharField(max_length=200)
+    # Denormalized counters, kept current by tasks.counters alongside every Task mutation
+    total_tasks = models.PositiveIntegerField(default=0)
+    completed_tasks = models.PositiveIntegerField(default=0)
+    # Bumped with every change to the counters above; keys the client's cached dashboard card
+    version = models.PositiveBigIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Set when the user deletes the client; its tasks are purged in the background (see tasks.purge)
+    deleted_at = models.DateTimeField(null=True, blank=True)
+
+    objects = LiveClientManager()
+    all_objects = ClientQuerySet.as_manager()
 
     class Meta:
         ordering = ['name']
-        unique_together = ['user', 'name']  # Same client name can exist for different users
+        constraints = [
+            # Same client name can exist for different users, and again once deleted
+            models.UniqueConstraint(
+                fields=['user', 'name'], condition=Q(deleted_at__isnull=True), name='client_unique_live_name',
+            ),
+        ]
+        indexes = [
+            # Soft-deleted clients waiting to be purged
+            models.Index(fields=['deleted_at'], condition=Q(deleted_at__isnull=False), name='client_deleted_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
-    @property
-    def total_tasks(self):
-        return self.tasks.count()
-
-    @property
-    def completed_tasks(self):
-        return self.tasks.filter(is_completed=True).count()
-
     @property
     def pending_tasks(self):
-        return self.tasks.filter(is_completed=False).count()
+        return self.total_tasks - self.completed_tasks
 
     @property
     def completion_percentage(self):
@@ -48,7 +84,74 @@ class Task(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Per-client completion counts and the toggle/recount filters
+            models.Index(fields=['client', 'is_completed'], name='task_client_completed_idx'),
+            # Newest-first keyset pages of a client's tasks
+            models.Index(fields=['client', '-created_at', '-id'], name='task_client_recent_idx'),
+            # Newest-first listing across all clients (the admin changelist)
+            models.Index(fields=['-created_at', '-id'], name='task_recent_idx'),
+        ]
 
     def __str__(self):
         checkbox = "☑" if self.is_completed else "□"
         return f"{checkbox} {self.title}"
+
+
+class TaskArchive(models.Model):
+    """
+    A completed task moved out of the Task table by the ``archive_tasks`` command.
+    It keeps the original task id and timestamps, and still counts towards the
+    client and user counters; archived tasks are read-only.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='archived_tasks')
+    title = models.CharField(max_length=500)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # Newest-first keyset pages of a client's archived tasks
+            models.Index(fields=['client', '-created_at', '-id'], name='archive_client_recent_idx'),
+        ]
+
+    def __str__(self):
+        return f"☑ {self.title} (archived)"
+
+
+class UserStats(models.Model):
+    """Per-user rollup of client/task counters used by the global dashboard"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='task_stats')
+    total_clients = models.PositiveIntegerField(default=0)
+    total_tasks = models.PositiveIntegerField(default=0)
+    completed_tasks = models.PositiveIntegerField(default=0)
+    # Bumped by every mutation of the user's clients/tasks; keys the shared cache (tasks.cache)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'user stats'
+        verbose_name_plural = 'user stats'
+
+    def __str__(self):
+        return f"Stats for {self.user}"
+
+    @property
+    def pending_tasks(self):
+        return self.total_tasks - self.completed_tasks
+
+    @property
+    def completion_percentage(self):
+        if self.total_tasks == 0:
+            return 0
+        return round((self.completed_tasks / self.total_tasks) * 100)
+
+    @property
+    def remaining_percentage(self):
+        # The global dashboard shows 0% remaining when there is nothing to do
+        if self.total_tasks == 0:
+            return 0
+        return 100 - self.completion_percentage
@@ -0,0 +1,99 @@
+"""
+Client and task mutations shared by the sync views and the async (ASGI) views.
+
+Each function runs in its own transaction, applies the matching counter deltas
+(see tasks.counters) and returns the affected object. Lookups are scoped to the
+given user and raise Http404 for anything they do not own.
+"""
+from django.db import transaction
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+
+from .counters import adjust_task_counters, adjust_user_stats
+from .models import Client, Task
+
+
+def create_client(user, name):
+    with transaction.atomic():
+        client = Client.objects.create(user=user, name=name)
+        adjust_user_stats(user.pk, clients=1)
+    return client
+
+
+def delete_client(user, pk):
+    """
+    Soft-delete a client and take it and its tasks out of the user's rollup. The
+    rows themselves are removed later, in chunks, by ``purge_deleted_clients``.
+    """
+    with transaction.atomic():
+        # Task mutations update the client row (adjust_task_counters) before committing,
+        # so once this lock is held its counters include every committed delta, and
+        # later ones see the client deleted and leave the rollup alone
+        client = get_object_or_404(Client.objects.select_for_update(), pk=pk, user=user)
+        client.deleted_at = timezone.now()
+        client.save(update_fields=['deleted_at', 'updated_at'])
+        adjust_user_stats(
+            user.pk,
+            clients=-1,
+            total=-client.total_tasks,
+            completed=-client.completed_tasks,
+        )
+    return client
+
+
+def create_task(client, title):
+    with transaction.atomic():
+        task = Task.objects.create(client=client, title=title)
+        adjust_task_counters(client, total=1)
+    return task
+
+
+def _owned_tasks(user):
+    return Task.objects.filter(client__user=user, client__deleted_at__isnull=True)
+
+
+def _locked_task(user, pk):
+    # The row lock keeps concurrent toggles/deletes of one task from double-counting
+    return get_object_or_404(
+        _owned_tasks(user).select_related('client').select_for_update(of=('self',)),
+        pk=pk,
+    )
+
+
+def toggle_task(user, pk):
+    with transaction.atomic():
+        task = _locked_task(user, pk)
+        task.is_completed = not task.is_completed
+        task.save(update_fields=['is_completed', 'updated_at'])
+        adjust_task_counters(task.client, completed=1 if task.is_completed else -1)
+    return task
+
+
+def set_task_completed(user, pk, completed):
+    """
+    Mark a task completed or not with a single UPDATE that only matches while the
+    task is in the other state. Concurrent and repeated requests therefore change
+    the task, and its counters, at most once. Returns (task, changed).
+    """
+    with transaction.atomic():
+        # Ownership goes through a subquery on client_id rather than a join, which
+        # Django would turn into "id IN (...)". That way the state condition applies
+        # to the updated row itself, and PostgreSQL re-checks it after waiting on a
+        # concurrent update of the same task.
+        changed = bool(
+            Task.objects.filter(pk=pk, client__in=Client.objects.filter(user=user).values('pk'))
+            .exclude(is_completed=completed)
+            .update(is_completed=completed, updated_at=timezone.now())
+        )
+        task = get_object_or_404(_owned_tasks(user).select_related('client'), pk=pk)
+        if changed:
+            adjust_task_counters(task.client, completed=1 if completed else -1)
+    return task, changed
+
+
+def delete_task(user, pk):
+    with transaction.atomic():
+        task = _locked_task(user, pk)
+        task.delete()
+        adjust_task_counters(task.client, total=-1, completed=-1 if task.is_completed else 0)
+    return task
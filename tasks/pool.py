@@ -0,0 +1,280 @@
+"""
+A bounded, thread-safe pool of database connections for one process.
+
+tasks.postgresql_pool checks a connection out when Django opens one and puts it
+back when Django closes it (at the end of each request), so requests reuse a few
+warm connections instead of paying a TCP and TLS handshake each. The pool holds
+at most ``max_size`` connections; a checkout beyond that waits up to ``timeout``
+seconds for one to come back. Connections older than ``max_lifetime`` are
+replaced when returned, and idle ones are closed after ``max_idle`` seconds down
+to ``min_size``. A connection that sat idle for ``check_after`` seconds or more
+is pinged before it is handed out.
+
+The pool does not know what a connection is: ``connect`` opens one, ``check``
+tells whether one still works, ``reset`` cleans one up on return (returning
+False to discard it), and ``close`` closes one. Any DB-API connection can stand
+in, e.g. sqlite3 connections when there is no PostgreSQL server at hand.
+
+Checkout and wait counters are exported next to the request histograms by the
+metrics view, one series per pool (database alias and name). Like those histograms they are per process.
+"""
+import collections
+import os
+import threading
+import time
+
+from .metrics import _escape
+
+
+class PoolTimeout(Exception):
+    """No connection became available within the pool's timeout"""
+
+
+class PoolStats:
+    __slots__ = (
+        'checkouts', 'waits', 'wait_time', 'max_wait', 'timeouts',
+        'opened', 'closed', 'failed_checks',
+    )
+
+    def __init__(self):
+        for name in self.__slots__:
+            setattr(self, name, 0)
+
+
+class ConnectionPool:
+    def __init__(self, name, *, min_size=0, max_size=10, max_lifetime=1800, max_idle=300, timeout=10,
+                 check=None, reset=None, close=None, check_after=1.0):
+        if max_size < 1 or not 0 <= min_size <= max_size:
+            raise ValueError('Pool sizes must satisfy 0 <= min_size <= max_size and max_size >= 1')
+        self.name = name
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.check_after = check_after
+        self._check = check
+        self._reset = reset
+        self._close = close or (lambda conn: conn.close())
+        self._cond = threading.Condition()
+        # Idle connections as [conn, opened_at, returned_at], most recently returned last.
+        # Handing out the warmest one first lets the rest sit long enough to be evicted.
+        self._idle = []
+        self._opened_at = {}  # id(conn) -> monotonic time, for every open connection
+        self._opening = 0  # Connections being opened outside the lock
+        # One list per waiting checkout, filled with an idle entry or None (open a new one)
+        self._waiters = collections.deque()
+        self.stats = PoolStats()
+
+    @property
+    def size(self):
+        return len(self._opened_at) + self._opening
+
+    def getconn(self, connect):
+        """Check out an idle connection, or open one with ``connect()`` if the pool has room"""
+        started = time.monotonic()
+        deadline = started + self.timeout
+        waited = False
+        while True:
+            with self._cond:
+                stale = self._evict_idle(time.monotonic())
+                if self._idle:
+                    entry = self._idle.pop()
+                elif self.size < self.max_size:
+                    # Reserve the slot before connecting outside the lock
+                    self._opening += 1
+                    entry = None
+                else:
+                    # Queue up: returned connections and freed slots go to the longest waiter
+                    slot = []
+                    self._waiters.append(slot)
+                    waited = True
+                    while not slot:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._waiters.remove(slot)
+                            self.stats.timeouts += 1
+                            raise PoolTimeout(
+                                f'No connection available in pool {self.name!r} '
+                                f'({self.max_size} in use) after {self.timeout}s'
+                            )
+                        self._cond.wait(remaining)
+                    entry = slot[0]
+            self._close_all(stale)
+
+            if entry is None:
+                conn = self._open(connect)
+                break
+            conn, _, returned_at = entry
+            if (
+                self._check is None
+                or time.monotonic() - returned_at < self.check_after
+                or self._safe(self._check, conn)
+            ):
+                break
+            self._discard(conn, failed_check=True)
+
+        waited_for = time.monotonic() - started
+        with self._cond:
+            self.stats.checkouts += 1
+            if waited:
+                self.stats.waits += 1
+                self.stats.wait_time += waited_for
+                self.stats.max_wait = max(self.stats.max_wait, waited_for)
+        return conn
+
+    def putconn(self, conn, discard=False):
+        """Return a checked-out connection; it is closed instead if broken, too old or ``discard``"""
+        opened_at = self._opened_at.get(id(conn))
+        now = time.monotonic()
+        if (
+            discard
+            or opened_at is None
+            or now - opened_at >= self.max_lifetime
+            or (self._reset is not None and not self._safe(self._reset, conn))
+        ):
+            self._discard(conn)
+            return
+        with self._cond:
+            entry = [conn, opened_at, now]
+            if self._waiters:
+                self._waiters.popleft().append(entry)
+                self._cond.notify_all()
+            else:
+                self._idle.append(entry)
+
+    def close(self):
+        """Close every idle connection; checked-out ones are closed when returned"""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            for conn, _, _ in idle:
+                del self._opened_at[id(conn)]
+                self.stats.closed += 1
+            self.max_lifetime = 0
+        self._close_all(conn for conn, _, _ in idle)
+
+    def snapshot(self):
+        with self._cond:
+            stats = {name: getattr(self.stats, name) for name in PoolStats.__slots__}
+            stats.update(size=self.size, idle=len(self._idle), in_use=self.size - len(self._idle))
+        return stats
+
+    def _open(self, connect):
+        try:
+            conn = connect()
+        except BaseException:
+            with self._cond:
+                self._opening -= 1
+                self._free_slot()
+            raise
+        with self._cond:
+            self._opening -= 1
+            self._opened_at[id(conn)] = time.monotonic()
+            self.stats.opened += 1
+        return conn
+
+    def _discard(self, conn, failed_check=False):
+        with self._cond:
+            self.stats.failed_checks += failed_check
+            if self._opened_at.pop(id(conn), False) is not False:
+                self.stats.closed += 1
+                self._free_slot()
+        self._close_all([conn])
+
+    def _free_slot(self):
+        """Let the longest waiter open a connection in a slot just freed (caller holds the lock)"""
+        if self._waiters:
+            self._opening += 1
+            self._waiters.popleft().append(None)
+            self._cond.notify_all()
+
+    def _evict_idle(self, now):
+        """Take idle connections past max_idle or max_lifetime out of the pool (caller holds the lock)"""
+        keep, stale = [], []
+        spare = self.size - self.min_size
+        # Oldest returns first, so the warmest connections are the ones kept
+        for entry in self._idle:
+            conn, opened_at, returned_at = entry
+            if now - opened_at >= self.max_lifetime or (spare > 0 and now - returned_at >= self.max_idle):
+                stale.append(conn)
+                del self._opened_at[id(conn)]
+                self.stats.closed += 1
+                spare -= 1
+            else:
+                keep.append(entry)
+        self._idle = keep
+        return stale
+
+    def _close_all(self, conns):
+        for conn in conns:
+            self._safe(self._close, conn)
+
+    @staticmethod
+    def _safe(func, conn):
+        try:
+            return func(conn) is not False
+        except Exception:
+            return False
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+_pools_pid = os.getpid()
+
+
+def get_pool(key, **options):
+    """
+    The process's pool for ``key`` (alias, database name, host, port, user),
+    created with ``options`` on first use. A forked worker starts with no pools
+    rather than sharing its parent's sockets.
+    """
+    global _pools_pid
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            _pools.clear()
+            _pools_pid = os.getpid()
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(key[0], **options)
+        return pool
+
+
+def close_pools(database_name=None):
+    """Close the idle connections of every pool, or of the pools for one database, and forget them"""
+    with _pools_lock:
+        keys = [key for key in _pools if database_name is None or key[1] == database_name]
+        pools = [_pools.pop(key) for key in keys]
+    for pool in pools:
+        pool.close()
+
+
+METRICS = {
+    # stat: (metric name, type, help text)
+    'checkouts': ('goalgrid_db_pool_checkouts_total', 'counter', 'Connections handed out by the pool'),
+    'waits': ('goalgrid_db_pool_waits_total', 'counter', 'Checkouts that had to wait for a connection'),
+    'wait_time': ('goalgrid_db_pool_wait_seconds_total', 'counter', 'Time checkouts spent waiting'),
+    'max_wait': ('goalgrid_db_pool_max_wait_seconds', 'gauge', 'Longest wait for a connection'),
+    'timeouts': ('goalgrid_db_pool_timeouts_total', 'counter', 'Checkouts that gave up waiting'),
+    'opened': ('goalgrid_db_pool_connections_opened_total', 'counter', 'Connections opened'),
+    'closed': ('goalgrid_db_pool_connections_closed_total', 'counter', 'Connections closed (expired, idle or broken)'),
+    'failed_checks': ('goalgrid_db_pool_failed_checks_total', 'counter', 'Idle connections that failed the health check'),
+    'size': ('goalgrid_db_pool_connections', 'gauge', 'Open connections'),
+    'idle': ('goalgrid_db_pool_idle_connections', 'gauge', 'Open connections waiting in the pool'),
+    'in_use': ('goalgrid_db_pool_in_use_connections', 'gauge', 'Connections checked out'),
+}
+
+
+def render_metrics():
+    """Pool counters of this process in the Prometheus text format, or '' without pools"""
+    with _pools_lock:
+        pools = list(_pools.items())
+    if not pools:
+        return ''
+    snapshots = [(key[0], key[1], pool.snapshot()) for key, pool in pools]
+    lines = []
+    for stat, (name, kind, help_text) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for alias, database, snapshot in snapshots:
+            lines.append(f'{name}{{alias="{_escape(alias)}",database="{_escape(str(database))}"}} {snapshot[stat]}')
+    return '\n'.join(lines) + '\n'
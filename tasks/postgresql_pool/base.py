@@ -0,0 +1,71 @@
+"""
+Django's PostgreSQL backend with connections drawn from a per-process pool
+(tasks.pool), selected with ENGINE = 'tasks.postgresql_pool'.
+
+OPTIONS['pool'] holds the pool's keyword arguments (min_size, max_size,
+max_lifetime, max_idle, timeout). Django opens and closes connections as usual;
+with CONN_MAX_AGE = 0 it closes each one when the request finishes, which here
+puts it back in the pool. With CONN_HEALTH_CHECKS on, the pool pings a
+connection that sat idle before handing it out.
+"""
+from django.db.backends.postgresql import base, creation
+
+from tasks.pool import PoolTimeout, close_pools, get_pool
+
+
+# Transaction statuses, the same numbers in psycopg2 and psycopg 3
+IDLE, IN_TRANSACTION, IN_ERROR = 0, 2, 3
+
+
+def _check(conn):
+    with conn.cursor() as cursor:
+        cursor.execute('SELECT 1')
+
+
+def _reset(conn):
+    """Roll back whatever a returned connection left open; False if it cannot be reused"""
+    if conn.closed:
+        return False
+    status = conn.info.transaction_status
+    if status in (IN_TRANSACTION, IN_ERROR):
+        conn.rollback()
+    return status in (IDLE, IN_TRANSACTION, IN_ERROR)
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # Idle pooled connections to the test database would block DROP DATABASE
+        close_pools(test_database_name)
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+    _pool = None
+
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        conn_params.pop('pool', None)
+        return conn_params
+
+    def get_new_connection(self, conn_params):
+        settings_dict = self.settings_dict
+        self._pool = get_pool(
+            (self.alias, settings_dict['NAME'], settings_dict['HOST'], settings_dict['PORT'], settings_dict['USER']),
+            check=_check if settings_dict['CONN_HEALTH_CHECKS'] else None,
+            reset=_reset,
+            **settings_dict['OPTIONS'].get('pool', {}),
+        )
+        connect = super().get_new_connection
+        try:
+            return self._pool.getconn(lambda: connect(conn_params))
+        except PoolTimeout as e:
+            # Surfaces as django.db.OperationalError, like a failed connect
+            raise self.Database.OperationalError(str(e)) from e
+
+    def _close(self):
+        if self.connection is None or self._pool is None:
+            return super()._close()
+        # A connection closed inside an atomic block is still used by that block
+        # until it exits, so it must not be handed to another request
+        self._pool.putconn(self.connection, discard=self.in_atomic_block)
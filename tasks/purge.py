@@ -0,0 +1,55 @@
+"""
+Background removal of soft-deleted clients.
+
+Deleting a client only sets ``deleted_at`` (see tasks.mutations.delete_client),
+which hides it everywhere at once and keeps the request fast however many tasks
+the client has. ``purge_deleted_clients`` then removes the rows: the client's
+tasks and archived tasks go in fixed-size chunks, each one a single
+``DELETE ... WHERE id IN (...)`` in its own short transaction, so neither memory
+use nor lock time grows with the size of the client. The client row goes last.
+
+The counters were already adjusted when the client was deleted, so purging does
+not touch them. A purge that is interrupted simply continues on the next run.
+"""
+import time
+
+from .models import Client, Task, TaskArchive
+
+
+PURGE_CHUNK_SIZE = 1000
+
+
+def purge_client(client_id, chunk_size=PURGE_CHUNK_SIZE, sleep=0):
+    """Remove a soft-deleted client and its tasks; returns the number of tasks removed"""
+    removed = 0
+    for model in (Task, TaskArchive):
+        while True:
+            ids = list(model.objects.filter(client_id=client_id).values_list('pk', flat=True)[:chunk_size])
+            if not ids:
+                break
+            # Nothing references tasks, so this is a single DELETE without loading any rows
+            removed += model.objects.filter(pk__in=ids).delete()[0]
+            if sleep:
+                time.sleep(sleep)
+    Client.all_objects.filter(pk=client_id, deleted_at__isnull=False).delete()
+    return removed
+
+
+def deleted_client_ids():
+    return list(
+        Client.all_objects.filter(deleted_at__isnull=False).order_by('deleted_at').values_list('pk', flat=True)
+    )
+
+
+def purge_deleted_clients(chunk_size=PURGE_CHUNK_SIZE, sleep=0, progress=None):
+    """
+    Purge every soft-deleted client, oldest deletion first. ``progress`` is
+    called with (client_id, tasks_removed) after each client. Returns the number
+    of clients purged.
+    """
+    client_ids = deleted_client_ids()
+    for client_id in client_ids:
+        removed = purge_client(client_id, chunk_size, sleep)
+        if progress:
+            progress(client_id, removed)
+    return len(client_ids)
@@ -0,0 +1,109 @@
+"""
+Read replicas with read-your-writes.
+
+TASKS_READ_REPLICAS lists database aliases that replicate ``default``.
+tasks.middleware.ReplicaMiddleware opens a ReplicaState for each request in a
+context variable, and ReplicaRouter sends the request's reads to one replica
+(the same one for the whole request) only while all of these hold:
+
+- the request is a GET, HEAD or OPTIONS; the mutation views are POST-only, so
+  everything they read comes from the primary
+- the browser has no pin cookie, which a request that wrote sets for
+  TASKS_REPLICA_PIN_SECONDS, longer than the replicas lag behind. A toggle
+  followed by a reload therefore reads its own write
+- the request has not written yet (a GET may, e.g. the first stats rollup)
+- no transaction is open on the primary
+
+Everything else, including management commands and anything outside a
+request, reads from and writes to the primary. Writes are spotted by an execute
+wrapper on every connection, like the query timer in tasks.metrics.
+"""
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+
+
+PIN_COOKIE = 'goalgrid_primary'
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE')
+
+_current = ContextVar('goalgrid_replica_state', default=None)
+
+
+class ReplicaState:
+    __slots__ = ('replica', 'wrote')
+
+    def __init__(self, replica):
+        self.replica = replica  # None: read from the primary
+        self.wrote = False
+
+
+def start_request(request):
+    """Pick the request's read database; returns (state, token for finish_request)"""
+    replicas = settings.TASKS_READ_REPLICAS
+    use_replica = replicas and request.method in SAFE_METHODS and PIN_COOKIE not in request.COOKIES
+    state = ReplicaState(random.choice(replicas) if use_replica else None)
+    return state, _current.set(state)
+
+
+def finish_request(token):
+    _current.reset(token)
+
+
+def pin_to_primary(response):
+    """Send the browser's reads to the primary for the next TASKS_REPLICA_PIN_SECONDS"""
+    response.set_cookie(
+        PIN_COOKIE, '1',
+        max_age=settings.TASKS_REPLICA_PIN_SECONDS,
+        secure=settings.SESSION_COOKIE_SECURE,
+        httponly=True,
+        samesite='Lax',
+    )
+
+
+def _detect_write(execute, sql, params, many, context):
+    state = _current.get()
+    if state is not None and not state.wrote and sql.lstrip()[:6].upper() in WRITE_STATEMENTS:
+        state.wrote = True
+    return execute(sql, params, many, context)
+
+
+def _install_write_detector(sender=None, connection=None, **kwargs):
+    if _detect_write not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_detect_write)
+
+
+def install_write_detector():
+    """Add the write-spotting execute wrapper to every database connection, now and in the future"""
+    connection_created.connect(_install_write_detector, dispatch_uid='goalgrid_write_detector')
+    for connection in connections.all(initialized_only=True):
+        _install_write_detector(connection=connection)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _current.get()
+        if state is None or state.replica is None or state.wrote or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        # Also for objects that were read from a replica
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.TASKS_READ_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive the primary's schema through replication
+        if db in settings.TASKS_READ_REPLICAS:
+            return False
+        return None
@@ -0,0 +1,170 @@
+"""
+Indexed search over a user's clients and task titles.
+
+SQLite (the local fallback) uses FTS5 tables kept in sync with triggers, queried
+with prefix terms and ranked by bm25. PostgreSQL uses pg_trgm GIN indexes, which
+serve ILIKE substring matches and rank by trigram similarity. Any other backend
+falls back to unindexed icontains lookups.
+
+``install_search_index`` creates (or repairs) the current index idempotently and
+is what ``rebuild_search_index`` runs. Migrations do not import it: they use the
+frozen copy in tasks/migrations/_search_index.py, so editing this module never
+changes what an old migration does. A change to the index here needs a new
+migration with its own copy of the SQL.
+
+On SQLite, any migration that rebuilds tasks_task or tasks_client (adding a
+column with a default, changing constraints, altering a field) drops the FTS
+triggers with the old table. Each such migration must end with a RunPython step
+that reinstalls them, as 0008 and 0009 do. Otherwise search silently stops
+seeing new and renamed rows until ``rebuild_search_index`` runs.
+"""
+import re
+
+from django.db import connection
+
+from .models import Client, Task
+
+
+SEARCH_PAGE_SIZE = 20
+
+SQLITE_INDEXED_COLUMNS = [
+    # (table, column)
+    ('tasks_client', 'name'),
+    ('tasks_task', 'title'),
+]
+
+
+def _sqlite_index_sql(table, column):
+    fts = f'{table}_fts'
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({column}, content='{table}', content_rowid='id')",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+            INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+            INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {column} ON {table} BEGIN
+            INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column});
+            INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column});
+        END""",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+POSTGRESQL_INDEX_SQL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS tasks_client_name_trgm ON tasks_client USING gin (name gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS tasks_task_title_trgm ON tasks_task USING gin (title gin_trgm_ops)',
+]
+
+
+def install_search_index(schema_editor):
+    """Create (or repair) the search index for the connection's backend"""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        statements = [sql for table, column in SQLITE_INDEXED_COLUMNS for sql in _sqlite_index_sql(table, column)]
+    elif vendor == 'postgresql':
+        statements = POSTGRESQL_INDEX_SQL
+    else:
+        return
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def drop_search_index(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for table, _ in SQLITE_INDEXED_COLUMNS:
+            for suffix in ('ai', 'ad', 'au'):
+                schema_editor.execute(f'DROP TRIGGER IF EXISTS {table}_fts_{suffix}')
+            schema_editor.execute(f'DROP TABLE IF EXISTS {table}_fts')
+    elif vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS tasks_client_name_trgm')
+        schema_editor.execute('DROP INDEX IF EXISTS tasks_task_title_trgm')
+
+
+def _fts_match(query):
+    """Turn free text into an FTS5 expression of quoted prefix terms"""
+    terms = re.findall(r'\w+', query)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def _like_pattern(query):
+    escaped = query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+
+def search_clients(user, query, limit=SEARCH_PAGE_SIZE, offset=0):
+    """Return the user's clients matching ``query``, best match first"""
+    if connection.vendor == 'sqlite':
+        match = _fts_match(query)
+        if not match:
+            return []
+        return list(Client.objects.raw(
+            """
+            SELECT c.id, c.name, c.total_tasks, c.completed_tasks
+            FROM tasks_client_fts
+            JOIN tasks_client c ON c.id = tasks_client_fts.rowid
+            WHERE tasks_client_fts MATCH %s AND c.user_id = %s AND c.deleted_at IS NULL
+            ORDER BY bm25(tasks_client_fts), c.name
+            LIMIT %s OFFSET %s
+            """,
+            [match, user.pk, limit, offset],
+        ))
+    if connection.vendor == 'postgresql':
+        return list(Client.objects.raw(
+            """
+            SELECT id, name, total_tasks, completed_tasks
+            FROM tasks_client
+            WHERE user_id = %s AND deleted_at IS NULL AND name ILIKE %s
+            ORDER BY similarity(name, %s) DESC, name
+            LIMIT %s OFFSET %s
+            """,
+            [user.pk, _like_pattern(query), query, limit, offset],
+        ))
+    return list(
+        Client.objects.filter(user=user, name__icontains=query)
+        .only('id', 'name', 'total_tasks', 'completed_tasks')[offset:offset + limit]
+    )
+
+
+def search_tasks(user, query, limit=SEARCH_PAGE_SIZE, offset=0):
+    """Return the user's tasks whose title matches ``query``, best match first.
+    Each task carries a ``client_name`` attribute."""
+    if connection.vendor == 'sqlite':
+        match = _fts_match(query)
+        if not match:
+            return []
+        return list(Task.objects.raw(
+            """
+            SELECT t.id, t.title, t.is_completed, t.client_id, c.name AS client_name
+            FROM tasks_task_fts
+            JOIN tasks_task t ON t.id = tasks_task_fts.rowid
+            JOIN tasks_client c ON c.id = t.client_id
+            WHERE tasks_task_fts MATCH %s AND c.user_id = %s AND c.deleted_at IS NULL
+            ORDER BY bm25(tasks_task_fts), t.id DESC
+            LIMIT %s OFFSET %s
+            """,
+            [match, user.pk, limit, offset],
+        ))
+    if connection.vendor == 'postgresql':
+        return list(Task.objects.raw(
+            """
+            SELECT t.id, t.title, t.is_completed, t.client_id, c.name AS client_name
+            FROM tasks_task t
+            JOIN tasks_client c ON c.id = t.client_id
+            WHERE c.user_id = %s AND c.deleted_at IS NULL AND t.title ILIKE %s
+            ORDER BY similarity(t.title, %s) DESC, t.id DESC
+            LIMIT %s OFFSET %s
+            """,
+            [user.pk, _like_pattern(query), query, limit, offset],
+        ))
+    tasks = (
+        Task.objects.filter(client__user=user, client__deleted_at__isnull=True, title__icontains=query)
+        .select_related('client')
+        .only('id', 'title', 'is_completed', 'client__name')[offset:offset + limit]
+    )
+    for task in tasks:
+        task.client_name = task.client.name
+    return list(tasks)
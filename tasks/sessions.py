@@ -0,0 +1,36 @@
+"""
+Session engine with coalesced writes.
+
+Sessions are read through the cache (falling back to the database) and, with
+tasks.middleware.SessionMiddleware, an unchanged session is only written back
+once its remaining lifetime drops below SESSION_REFRESH_THRESHOLD. This keeps
+the sliding expiry of SESSION_SAVE_EVERY_REQUEST without an UPDATE on
+django_session for every page view and AJAX call.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBSessionStore
+
+
+REFRESHED_AT_KEY = '_session_refreshed_at'
+
+# Refresh once less than this fraction of the session's lifetime remains
+DEFAULT_REFRESH_THRESHOLD = 0.9
+
+
+class SessionStore(CachedDBSessionStore):
+    def save(self, must_create=False):
+        # Every write extends the expiry, so remember when it happened
+        self._get_session(no_load=must_create)[REFRESHED_AT_KEY] = int(time.time())
+        super().save(must_create)
+
+    def needs_refresh(self):
+        """True when the stored expiry should be pushed out even though nothing changed"""
+        refreshed_at = self.get(REFRESHED_AT_KEY)
+        if refreshed_at is None:
+            return True
+        threshold = getattr(settings, 'SESSION_REFRESH_THRESHOLD', DEFAULT_REFRESH_THRESHOLD)
+        lifetime = self.get_expiry_age()
+        remaining = lifetime - (time.time() - refreshed_at)
+        return remaining < lifetime * threshold
@@ -0,0 +1,171 @@
+"""
+Startup-time profiling and the lean startup mode for cold-starting instances.
+
+With ``DJANGO_LEAN_STARTUP=True`` the social login stack stays unloaded until a
+request under ``accounts/`` needs it: DeferredSocialAccountConfig skips the
+provider registry load that allauth.socialaccount does in ``ready()`` (it
+imports every provider module, and with them ``requests``), and
+``deferred_include`` mounts the allauth URLconf only when the first request
+under its prefix arrives. Until then the allauth URL names cannot be reversed,
+so pages must link to those URLs by path (see login.html).
+
+``profile_startup`` runs the project in fresh interpreters and reports how long
+settings, ``django.setup()`` and the first request take, plus a per-app and
+per-module breakdown of the import time from ``python -X importtime``.
+"""
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import threading
+from collections import namedtuple
+from importlib import import_module
+
+from allauth.socialaccount.apps import SocialAccountConfig
+from django.conf import settings
+from django.urls import clear_url_caches, include, path, re_path, resolve
+
+
+class DeferredSocialAccountConfig(SocialAccountConfig):
+    """allauth.socialaccount without loading the provider registry at startup"""
+
+    def ready(self):
+        # Registers the system checks. The registry loads itself the first time the
+        # provider list is asked for, which building the allauth URLconf does.
+        from allauth.socialaccount import checks  # noqa: F401
+
+
+def deferred_include(route, urlconf_name):
+    """
+    Stand-in for ``path(route, include(urlconf_name))`` in the root URLconf that
+    imports ``urlconf_name`` on the first request under ``route``, swaps the real
+    include in and serves the request from it.
+    """
+    lock = threading.Lock()
+
+    def mount(request, *args, **kwargs):
+        with lock:
+            urlpatterns = import_module(settings.ROOT_URLCONF).urlpatterns
+            if placeholder in urlpatterns:
+                urlpatterns[urlpatterns.index(placeholder)] = path(route, include(urlconf_name))
+                clear_url_caches()
+        match = resolve(request.path_info)
+        request.resolver_match = match
+        return match.func(request, *match.args, **match.kwargs)
+
+    placeholder = re_path(f'^{re.escape(route)}', mount)
+    return placeholder
+
+
+# Phase timings of a cold start, printed as JSON by a fresh interpreter. It serves
+# the request through the WSGI application the way a deployment does, and imports
+# nothing from the project itself, so it measures only the project's own startup.
+_PROBE = '''
+import json, sys, time
+started = time.perf_counter()
+import django
+from django.conf import settings
+settings.INSTALLED_APPS  # Imports the settings module
+configured = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+ready = time.perf_counter()
+from wsgiref.util import setup_testing_defaults
+path, _, query = sys.argv[1].partition('?')
+environ = {'PATH_INFO': path, 'QUERY_STRING': query, 'HTTP_HOST': sys.argv[2], 'wsgi.url_scheme': 'https'}
+setup_testing_defaults(environ)
+statuses = []
+b''.join(application(environ, lambda status, headers, exc_info=None: statuses.append(status)))
+done = time.perf_counter()
+print(json.dumps({
+    'status': int(statuses[0].split()[0]),
+    'settings': configured - started,
+    'setup': ready - configured,
+    'first_request': done - ready,
+    'modules': len(sys.modules),
+}))
+'''
+
+StartupTimings = namedtuple('StartupTimings', ['status', 'settings', 'setup', 'first_request', 'modules'])
+ImportTime = namedtuple('ImportTime', ['module', 'self', 'cumulative'])
+
+
+def _run_probe(url, host, env, importtime=False):
+    command = [sys.executable]
+    if importtime:
+        command += ['-X', 'importtime']
+    command += ['-c', _PROBE, url, host]
+    result = subprocess.run(
+        command, cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=False,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f'Startup probe failed:\n{result.stderr[-2000:]}')
+    return StartupTimings(**json.loads(result.stdout.strip().splitlines()[-1])), result.stderr
+
+
+def probe_environment(lean):
+    """The current environment with the settings module set and the lean mode on or off"""
+    env = dict(os.environ)
+    env['DJANGO_SETTINGS_MODULE'] = os.environ.get('DJANGO_SETTINGS_MODULE', 'taskmanager.settings')
+    env['DJANGO_LEAN_STARTUP'] = 'True' if lean else 'False'
+    return env
+
+
+def measure_startup(url='/login/', host='localhost', modes=(False,), repeat=5):
+    """
+    Time ``repeat`` cold starts per mode (lean or not), each in a new
+    interpreter. The modes take turns so that drift in machine load affects
+    them alike. Returns {lean: [StartupTimings, ...]}.
+    """
+    envs = {lean: probe_environment(lean) for lean in modes}
+    timings = {lean: [] for lean in modes}
+    for _ in range(repeat):
+        for lean in modes:
+            timings[lean].append(_run_probe(url, host, envs[lean])[0])
+    return timings
+
+
+def profile_imports(url='/login/', host='localhost', lean=False):
+    """One cold start under ``-X importtime``; returns its ImportTime records (microseconds)"""
+    _, stderr = _run_probe(url, host, probe_environment(lean), importtime=True)
+    return parse_importtime(stderr)
+
+
+def parse_importtime(output):
+    records = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, module = line[len('import time:'):].split('|')
+        records.append(ImportTime(module.strip(), int(own), int(cumulative)))
+    return records
+
+
+def group_import_times(records, app_names):
+    """
+    Total self time per installed app (the longest matching app module wins) or,
+    for modules outside every app, per top-level package. Returns
+    [(group, microseconds, module count)], slowest first.
+    """
+    prefixes = sorted(app_names, key=len, reverse=True)
+    groups = {}
+    for record in records:
+        group = next(
+            (app for app in prefixes if record.module == app or record.module.startswith(app + '.')),
+            record.module.split('.')[0],
+        )
+        total, count = groups.get(group, (0, 0))
+        groups[group] = (total + record.self, count + 1)
+    return sorted(((group, total, count) for group, (total, count) in groups.items()), key=lambda g: -g[1])
+
+
+def summarize_startup(timings):
+    """Median milliseconds of each phase, and of the whole cold start"""
+    phases = {
+        phase: statistics.median(getattr(t, phase) for t in timings) * 1000
+        for phase in ('settings', 'setup', 'first_request')
+    }
+    phases['total'] = statistics.median(t.settings + t.setup + t.first_request for t in timings) * 1000
+    return phases
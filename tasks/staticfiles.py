@@ -0,0 +1,75 @@
+"""
+Static files for the ASGI entry point.
+
+WhiteNoiseMiddleware is sync-only. In the middleware chain of an ASGI
+application it makes Django adapt the whole chain, so every request, including
+the async views and the ``events`` stream, holds a thread until it returns.
+With ASYNC_VIEWS on, settings therefore leave it out of MIDDLEWARE and
+taskmanager/asgi.py wraps the application in ASGIStaticFiles instead. That serves
+the same files with WhiteNoise's lookup and headers (compressed variants,
+long-lived caching of fingerprinted names) before Django is involved at all.
+"""
+from asgiref.sync import sync_to_async
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+
+STATIC_MIDDLEWARE = 'whitenoise.middleware.WhiteNoiseMiddleware'
+
+CHUNK_SIZE = 64 * 1024
+
+
+def async_middleware(middleware):
+    """MIDDLEWARE without the sync-only static file middleware"""
+    return [path for path in middleware if path != STATIC_MIDDLEWARE]
+
+
+class ASGIStaticFiles:
+    def __init__(self, application):
+        self.application = application
+        # Only the file lookup is used, not the middleware call
+        self.whitenoise = WhiteNoiseMiddleware()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http':
+            path = scope['path']
+            root_path = scope.get('root_path', '')
+            if root_path and path.startswith(root_path):
+                path = path[len(root_path):]
+            if path.startswith(self.whitenoise.static_prefix):
+                static_file = await sync_to_async(self.find_file, thread_sensitive=False)(path)
+                if static_file is not None:
+                    await self.serve(static_file, scope, send)
+                    return
+        await self.application(scope, receive, send)
+
+    def find_file(self, path):
+        if self.whitenoise.autorefresh:
+            return self.whitenoise.find_file(path)
+        return self.whitenoise.files.get(path)
+
+    async def serve(self, static_file, scope, send):
+        # StaticFile reads the conditional, range and encoding headers WSGI-style
+        request_headers = {
+            'HTTP_' + name.decode('latin-1').upper().replace('-', '_'): value.decode('latin-1')
+            for name, value in scope['headers']
+        }
+        response = static_file.get_response(scope['method'], request_headers)
+        await send({
+            'type': 'http.response.start',
+            'status': int(response.status),
+            'headers': [(key.lower().encode('latin-1'), value.encode('latin-1')) for key, value in response.headers],
+        })
+        file = response.file
+        if file is None:
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        read = sync_to_async(file.read, thread_sensitive=False)
+        try:
+            while True:
+                chunk = await read(CHUNK_SIZE)
+                more = len(chunk) == CHUNK_SIZE
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': more})
+                if not more:
+                    break
+        finally:
+            file.close()
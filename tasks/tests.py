@@ -0,0 +1,628 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from importlib.util import find_spec
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import IntegrityError, connection
+from django.utils import timezone
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+
+from .admin import ESTIMATED_COUNT_THRESHOLD, EstimatedCountPaginator
+from .batch import BatchError, apply_batch
+from .imports import InvalidImport, _apply_batch, import_records
+from .models import Client, Task, TaskArchive, UserStats
+from .counters import recompute_counters
+from .mutations import create_client, create_task, delete_client, delete_task, toggle_task
+from .pool import ConnectionPool, PoolTimeout
+from .replicas import PIN_COOKIE, finish_request, start_request
+from .search import search_clients, search_tasks
+from .staticfiles import ASGIStaticFiles
+
+
+ESTIMATE = ESTIMATED_COUNT_THRESHOLD * 10
+
+# Pages render without running collectstatic first
+plain_static_files = override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+
+
+@plain_static_files
+@mock.patch.object(EstimatedCountPaginator, 'estimated_count', return_value=ESTIMATE)
+class EstimatedCountPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        client = Client.objects.create(user=cls.admin, name='Acme')
+        Task.objects.create(client=client, title='Report')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def result_count(self, url):
+        response = self.client.get(url, secure=True)
+        self.assertEqual(response.status_code, 200)
+        return response.context['cl'].result_count
+
+    def test_default_changelists_are_estimated(self, estimated_count):
+        # Their querysets carry the soft-delete filter, which is not a user filter
+        for model in ('client', 'task', 'taskarchive', 'userstats'):
+            with self.subTest(model=model):
+                self.assertEqual(self.result_count(f'/admin/tasks/{model}/'), ESTIMATE)
+
+    def test_filtered_changelists_are_counted(self, estimated_count):
+        self.assertEqual(self.result_count('/admin/tasks/client/?q=Acme'), 1)
+        self.assertEqual(self.result_count('/admin/tasks/task/?is_completed__exact=0'), 1)
+
+    def test_other_users_lists_are_counted(self, estimated_count):
+        staff = User.objects.create_user('staff', 'staff@example.com', 'pw', is_staff=True)
+        staff.user_permissions.set(
+            User._meta.get_field('user_permissions').related_model.objects.filter(codename='view_client')
+        )
+        self.client.force_login(staff)
+        self.assertEqual(self.result_count('/admin/tasks/client/'), 0)
+
+
+@plain_static_files
+class AdminCounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        cls.acme = Client.objects.create(user=cls.admin, name='Acme', total_tasks=1)
+        cls.task = Task.objects.create(client=cls.acme, title='Report')
+        UserStats.objects.create(user=cls.admin, total_clients=1, total_tasks=1)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def post(self, url, data):
+        response = self.client.post(url, data, secure=True)
+        self.assertEqual(response.status_code, 302)
+
+    def assertCounters(self, client, total, completed):
+        client.refresh_from_db()
+        self.assertEqual((client.total_tasks, client.completed_tasks), (total, completed))
+
+    def test_task_add_edit_and_delete_keep_counters(self):
+        stats_version = UserStats.objects.get(user=self.admin).version
+        self.post('/admin/tasks/task/add/', {'client': self.acme.pk, 'title': 'Invoice', 'is_completed': 'on'})
+        self.assertCounters(self.acme, 2, 1)
+
+        globex = Client.objects.create(user=self.admin, name='Globex')
+        self.post(f'/admin/tasks/task/{self.task.pk}/change/', {'client': globex.pk, 'title': 'Report'})
+        self.assertCounters(self.acme, 1, 1)
+        self.assertCounters(globex, 1, 0)
+
+        self.post('/admin/tasks/task/', {
+            'action': 'delete_selected', 'post': 'yes',
+            '_selected_action': list(Task.objects.values_list('pk', flat=True)),
+        })
+        self.assertCounters(self.acme, 0, 0)
+        self.assertCounters(globex, 0, 0)
+        stats = UserStats.objects.get(user=self.admin)
+        self.assertEqual((stats.total_tasks, stats.completed_tasks), (0, 0))
+        self.assertGreater(stats.version, stats_version)
+
+    def test_client_delete_is_soft(self):
+        self.post(f'/admin/tasks/client/{self.acme.pk}/delete/', {'post': 'yes'})
+        self.assertIsNotNone(Client.all_objects.get(pk=self.acme.pk).deleted_at)
+        self.assertTrue(Task.objects.filter(pk=self.task.pk).exists())
+        stats = UserStats.objects.get(user=self.admin)
+        self.assertEqual((stats.total_clients, stats.total_tasks), (0, 0))
+
+
+# Routing only: the alias is never queried, so it need not be in DATABASES.
+# Not a TestCase, whose enclosing transaction would keep every read on the primary.
+@override_settings(TASKS_READ_REPLICAS=['replica1'])
+class ReplicaRouterTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner', 'owner@example.com', 'pw')
+        self.acme = Client.objects.create(user=self.user, name='Acme')
+
+    def read_databases(self, cookies):
+        """Where a GET request reads from before and after it writes"""
+        request = RequestFactory().get('/')
+        request.COOKIES.update(cookies)
+        state, token = start_request(request)
+        try:
+            before = Task.objects.all().db
+            Task.objects.create(client=self.acme, title='Report')
+            return before, Task.objects.all().db
+        finally:
+            finish_request(token)
+
+    def test_reads_move_to_the_primary_after_a_write(self):
+        self.assertEqual(self.read_databases({}), ('replica1', 'default'))
+
+    def test_pinned_browser_reads_from_the_primary(self):
+        self.assertEqual(self.read_databases({PIN_COOKIE: '1'}), ('default', 'default'))
+
+
+class CounterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner', 'owner@example.com', 'pw')
+
+    def counters(self, client):
+        client = Client.all_objects.get(pk=client.pk)
+        stats = UserStats.objects.get(user=self.user)
+        return (
+            (client.total_tasks, client.completed_tasks, client.version),
+            (stats.total_clients, stats.total_tasks, stats.completed_tasks, stats.version),
+        )
+
+    def test_mutation_deltas(self):
+        client = create_client(self.user, 'Acme')
+        self.assertEqual(self.counters(client), ((0, 0, 0), (1, 0, 0, 0)))
+
+        task = create_task(client, 'Report')
+        create_task(client, 'Invoice')
+        self.assertEqual(self.counters(client), ((2, 0, 2), (1, 2, 0, 2)))
+
+        toggle_task(self.user, task.pk)
+        self.assertEqual(self.counters(client), ((2, 1, 3), (1, 2, 1, 3)))
+
+        delete_task(self.user, task.pk)
+        self.assertEqual(self.counters(client), ((1, 0, 4), (1, 1, 0, 4)))
+
+        delete_client(self.user, client.pk)
+        self.assertEqual(self.counters(client)[1], (0, 0, 0, 5))
+
+    def test_recompute_counters_repairs_drift(self):
+        acme = Client.objects.create(user=self.user, name='Acme')
+        Task.objects.create(client=acme, title='Report', is_completed=True)
+        Task.objects.create(client=acme, title='Invoice')
+        now = timezone.now()
+        # Archived tasks are completed and still count
+        TaskArchive.objects.create(id=1000, client=acme, title='Old', created_at=now, updated_at=now)
+        globex = Client.objects.create(user=self.user, name='Globex')
+        UserStats.objects.create(user=self.user, total_clients=5, total_tasks=50, completed_tasks=7)
+
+        self.assertEqual(recompute_counters([self.user.pk]), (1, 1))
+        self.assertEqual(self.counters(acme), ((3, 2, 1), (2, 3, 2, 1)))
+        self.assertEqual(self.counters(globex)[0], (0, 0, 0))
+
+        # A second run finds nothing to fix
+        self.assertEqual(recompute_counters([self.user.pk]), (0, 1))
+        self.assertEqual(self.counters(acme)[0], (3, 2, 1))
+
+
+class DeleteClientCounterTests(TestCase):
+    def test_toggle_after_delete_leaves_rollup_alone(self):
+        user = User.objects.create_user('owner', 'owner@example.com', 'pw')
+        acme = Client.objects.create(user=user, name='Acme', total_tasks=1)
+        task = Task.objects.create(client=acme, title='Report')
+        UserStats.objects.create(user=user, total_clients=1, total_tasks=1)
+
+        # A toggle that read the task before the delete and updates the counters after it
+        with mock.patch('tasks.mutations._locked_task', return_value=task):
+            delete_client(user, acme.pk)
+            toggle_task(user, task.pk)
+
+        stats = UserStats.objects.get(user=user)
+        self.assertEqual((stats.total_clients, stats.total_tasks, stats.completed_tasks), (0, 0, 0))
+
+
+# Finds files in static/ without collectstatic, like DEBUG does
+@override_settings(WHITENOISE_AUTOREFRESH=True, WHITENOISE_USE_FINDERS=True)
+class ASGIStaticFilesTests(SimpleTestCase):
+    def request(self, path, headers=()):
+        async def application(scope, receive, send):
+            await send({'type': 'http.response.start', 'status': 204, 'headers': []})
+            await send({'type': 'http.response.body', 'body': b''})
+
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {'type': 'http', 'method': 'GET', 'path': path, 'root_path': '', 'headers': list(headers)}
+        asyncio.run(ASGIStaticFiles(application)(scope, None, send))
+        start, *body = messages
+        return start['status'], dict(start['headers']), b''.join(message['body'] for message in body)
+
+    def test_serves_static_files(self):
+        status, headers, body = self.request('/static/js/main.js')
+        self.assertEqual(status, 200)
+        self.assertEqual(headers[b'content-type'], b'text/javascript; charset="utf-8"')
+        with open(settings.BASE_DIR / 'static/js/main.js', 'rb') as file:
+            self.assertEqual(body, file.read())
+
+    def test_answers_conditional_requests(self):
+        _, headers, _ = self.request('/static/js/main.js')
+        status, _, body = self.request('/static/js/main.js', [(b'if-none-match', headers[b'etag'])])
+        self.assertEqual((status, body), (304, b''))
+
+    def test_passes_other_paths_to_django(self):
+        self.assertEqual(self.request('/')[0], 204)
+        self.assertEqual(self.request('/static/missing.js')[0], 204)
+
+
+def sqlite_connect():
+    # Any DB-API connection stands in for a PostgreSQL one
+    return sqlite3.connect(':memory:', check_same_thread=False)
+
+
+class Clock:
+    """Replaces the pool's time.monotonic(), for expiry tests that do not sleep"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def wait_for(self, condition):
+        deadline = time.monotonic() + 5
+        while not condition():
+            self.assertLess(time.monotonic(), deadline, 'Timed out')
+            time.sleep(0.001)
+
+    def test_reuses_returned_connections(self):
+        pool = ConnectionPool('test')
+        conn = pool.getconn(sqlite_connect)
+        pool.putconn(conn)
+        self.assertIs(pool.getconn(sqlite_connect), conn)
+        self.assertEqual(pool.snapshot()['opened'], 1)
+
+    def test_max_size_and_fair_handoff(self):
+        pool = ConnectionPool('test', max_size=1, timeout=5)
+        conn = pool.getconn(sqlite_connect)
+        order = []
+
+        def worker(name):
+            got = pool.getconn(sqlite_connect)
+            order.append(name)
+            pool.putconn(got)
+
+        threads = []
+        for number, name in enumerate(['first', 'second', 'third'], 1):
+            threads.append(threading.Thread(target=worker, args=(name,)))
+            threads[-1].start()
+            # Queue the waiters in a known order
+            self.wait_for(lambda: len(pool._waiters) == number)
+        self.assertEqual(pool.size, 1)
+
+        pool.putconn(conn)
+        for thread in threads:
+            thread.join()
+        self.assertEqual(order, ['first', 'second', 'third'])
+        stats = pool.snapshot()
+        self.assertEqual((stats['opened'], stats['waits'], stats['size']), (1, 3, 1))
+
+    def test_timeout(self):
+        pool = ConnectionPool('test', max_size=1, timeout=0.05)
+        pool.getconn(sqlite_connect)
+        with self.assertRaises(PoolTimeout):
+            pool.getconn(sqlite_connect)
+        self.assertEqual(pool.snapshot()['timeouts'], 1)
+        self.assertFalse(pool._waiters)
+
+    @mock.patch('tasks.pool.time.monotonic', new_callable=Clock)
+    def test_max_idle_closes_spare_connections(self, clock):
+        pool = ConnectionPool('test', min_size=1, max_idle=10)
+        first, second = pool.getconn(sqlite_connect), pool.getconn(sqlite_connect)
+        pool.putconn(first)
+        clock.now += 5
+        pool.putconn(second)
+        clock.now += 6
+
+        # Only the connection idle for 11s goes, and min_size keeps the other one
+        self.assertIs(pool.getconn(sqlite_connect), second)
+        self.assertEqual(pool.snapshot()['closed'], 1)
+        pool.putconn(second)
+        clock.now += 60
+        self.assertIs(pool.getconn(sqlite_connect), second)
+
+    @mock.patch('tasks.pool.time.monotonic', new_callable=Clock)
+    def test_max_lifetime_replaces_old_connections(self, clock):
+        pool = ConnectionPool('test', max_lifetime=100)
+        old = pool.getconn(sqlite_connect)
+        clock.now += 100
+        # Closed on return instead of going back to the pool
+        pool.putconn(old)
+        self.assertEqual(pool.snapshot()['size'], 0)
+
+        idle = pool.getconn(sqlite_connect)
+        pool.putconn(idle)
+        clock.now += 100
+        # Also when it expires while idle
+        self.assertIsNot(pool.getconn(sqlite_connect), idle)
+        self.assertEqual(pool.snapshot()['closed'], 2)
+
+    def test_failed_health_check_opens_a_new_connection(self):
+        def check(conn):
+            raise sqlite3.OperationalError('server closed the connection')
+
+        pool = ConnectionPool('test', check=check, check_after=0)
+        broken = pool.getconn(sqlite_connect)
+        pool.putconn(broken)
+        conn = pool.getconn(sqlite_connect)
+        self.assertIsNot(conn, broken)
+        stats = pool.snapshot()
+        self.assertEqual((stats['failed_checks'], stats['opened'], stats['size']), (1, 2, 1))
+
+    def test_recently_used_connections_skip_the_health_check(self):
+        check = mock.Mock()
+        pool = ConnectionPool('test', check=check, check_after=60)
+        pool.putconn(pool.getconn(sqlite_connect))
+        pool.getconn(sqlite_connect)
+        check.assert_not_called()
+
+    def test_failed_connect_frees_its_slot_for_a_waiter(self):
+        pool = ConnectionPool('test', max_size=1, timeout=5)
+        connecting = threading.Event()
+        fail = threading.Event()
+        errors = []
+
+        def failing_connect():
+            connecting.set()
+            fail.wait()
+            raise sqlite3.OperationalError('could not connect')
+
+        def opener():
+            try:
+                pool.getconn(failing_connect)
+            except sqlite3.OperationalError as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=opener)
+        thread.start()
+        connecting.wait()
+        waiter_conns = []
+        waiter = threading.Thread(target=lambda: waiter_conns.append(pool.getconn(sqlite_connect)))
+        waiter.start()
+        self.wait_for(lambda: pool._waiters)
+
+        fail.set()
+        thread.join()
+        waiter.join()
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(len(waiter_conns), 1)
+        self.assertEqual(pool.snapshot()['size'], 1)
+
+    def test_failed_reset_discards_the_connection(self):
+        pool = ConnectionPool('test', reset=lambda conn: False)
+        conn = pool.getconn(sqlite_connect)
+        pool.putconn(conn)
+        self.assertIsNot(pool.getconn(sqlite_connect), conn)
+
+
+@skipUnless(find_spec('psycopg2') or find_spec('psycopg'), 'needs a PostgreSQL driver')
+class PooledDatabaseWrapperTests(SimpleTestCase):
+    def test_close_inside_atomic_block_discards_the_connection(self):
+        from .postgresql_pool.base import DatabaseWrapper
+
+        pool = ConnectionPool('test')
+        wrapper = DatabaseWrapper({**connection.settings_dict, 'OPTIONS': {}}, alias='pooled')
+        wrapper._pool = pool
+
+        wrapper.connection = pool.getconn(sqlite_connect)
+        wrapper._close()
+        self.assertEqual(pool.snapshot()['idle'], 1)
+
+        wrapper.connection = pool.getconn(sqlite_connect)
+        wrapper.in_atomic_block = True
+        wrapper._close()
+        stats = pool.snapshot()
+        self.assertEqual((stats['idle'], stats['size'], stats['closed']), (0, 0, 1))
+
+
+class ImportRecordsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('owner', 'owner@example.com', 'pw')
+        cls.acme = Client.objects.create(user=cls.user, name='Acme', total_tasks=1, completed_tasks=1)
+        Task.objects.create(client=cls.acme, title='Report', is_completed=True)
+        UserStats.objects.create(user=cls.user, total_clients=1, total_tasks=1, completed_tasks=1)
+
+    def lines(self, *records):
+        return [json.dumps(record) + '\n' for record in records]
+
+    def assertStats(self, clients, total, completed):
+        stats = UserStats.objects.get(user=self.user)
+        self.assertEqual((stats.total_clients, stats.total_tasks, stats.completed_tasks), (clients, total, completed))
+
+    def test_counters(self):
+        version = Client.objects.get(pk=self.acme.pk).version
+        lines = self.lines(
+            {'client': 'Acme', 'title': 'Invoice', 'is_completed': True},
+            {'client': 'Acme', 'title': 'Call'},
+            {'client': 'Globex', 'title': 'Plan', 'is_completed': 'yes'},
+            {'client': 'Initech'},
+        )
+        result = import_records(self.user, lines, 'jsonl', batch_size=3)
+        self.assertEqual(result, {'rows': 4, 'batches': 2, 'clients_created': 2, 'tasks_created': 3})
+
+        acme = Client.objects.get(pk=self.acme.pk)
+        self.assertEqual((acme.total_tasks, acme.completed_tasks), (3, 2))
+        self.assertGreater(acme.version, version)
+        globex = Client.objects.get(user=self.user, name='Globex')
+        self.assertEqual((globex.total_tasks, globex.completed_tasks), (1, 1))
+        self.assertStats(3, 4, 3)
+
+    def test_dry_run_writes_nothing(self):
+        lines = self.lines(
+            {'client': 'Acme', 'title': 'Invoice'},
+            {'client': 'Globex', 'title': 'Plan'},
+            {'client': 'Globex', 'title': 'Call'},
+        )
+        result = import_records(self.user, lines, 'jsonl', batch_size=2, dry_run=True)
+        # Globex counts once, although the second batch sees it again
+        self.assertEqual(result, {'rows': 3, 'batches': 2, 'clients_created': 1, 'tasks_created': 3})
+        self.assertEqual(Client.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(Task.objects.count(), 1)
+        self.assertStats(1, 1, 1)
+
+    def test_invalid_row_reports_committed_batches(self):
+        lines = self.lines(
+            {'client': 'Acme', 'title': 'Invoice'},
+            {'client': 'Acme', 'title': 'Call'},
+            {'client': 'Acme', 'title': 'Plan'},
+            {'client': 'Acme', 'title': 'Draft', 'is_completed': 'maybe'},
+        )
+        with self.assertRaisesMessage(InvalidImport, 'Line 4: is_completed must be true or false') as raised:
+            import_records(self.user, lines, 'jsonl', batch_size=2)
+        self.assertEqual(raised.exception.result, {'rows': 2, 'batches': 1, 'clients_created': 0, 'tasks_created': 2})
+        # The batch holding the invalid row is not applied
+        self.assertEqual(Client.objects.get(pk=self.acme.pk).total_tasks, 3)
+        self.assertFalse(Task.objects.filter(title='Plan').exists())
+        self.assertStats(1, 3, 1)
+
+    def test_batch_is_retried_when_a_client_is_created_concurrently(self):
+        def racing_apply_batch(*args):
+            if not racing_apply_batch.raced:
+                racing_apply_batch.raced = True
+                # Another request creates the client and wins the unique constraint
+                Client.objects.create(user=self.user, name='Globex')
+                UserStats.objects.filter(user=self.user).update(total_clients=2)
+                raise IntegrityError('duplicate key value violates unique constraint "client_unique_live_name"')
+            return _apply_batch(*args)
+        racing_apply_batch.raced = False
+
+        with mock.patch('tasks.imports._apply_batch', side_effect=racing_apply_batch):
+            result = import_records(self.user, self.lines({'client': 'Globex', 'title': 'Plan'}), 'jsonl')
+        self.assertEqual((result['clients_created'], result['tasks_created']), (0, 1))
+        self.assertEqual(Client.objects.get(user=self.user, name='Globex').total_tasks, 1)
+        self.assertStats(2, 2, 1)
+
+    def test_repeated_conflicts_are_reported(self):
+        with mock.patch('tasks.imports._apply_batch', side_effect=IntegrityError):
+            with self.assertRaises(InvalidImport) as raised:
+                import_records(self.user, self.lines({'client': 'Globex'}), 'jsonl')
+        self.assertEqual(raised.exception.result['rows'], 0)
+
+
+@plain_static_files
+class BatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('owner', 'owner@example.com', 'pw')
+        cls.acme = Client.objects.create(user=cls.user, name='Acme', total_tasks=2, completed_tasks=1)
+        cls.report = Task.objects.create(client=cls.acme, title='Report', is_completed=True)
+        cls.invoice = Task.objects.create(client=cls.acme, title='Invoice')
+        cls.globex = Client.objects.create(user=cls.user, name='Globex', total_tasks=1)
+        cls.plan = Task.objects.create(client=cls.globex, title='Plan')
+        UserStats.objects.create(user=cls.user, total_clients=2, total_tasks=3, completed_tasks=1)
+
+        other = User.objects.create_user('other', 'other@example.com', 'pw')
+        cls.other_client = Client.objects.create(user=other, name='Other', total_tasks=1)
+        cls.other_task = Task.objects.create(client=cls.other_client, title='Not yours')
+
+    def post(self, operations):
+        self.client.force_login(self.user)
+        return self.client.post(
+            '/task/batch/', json.dumps({'operations': operations}), content_type='application/json', secure=True,
+        )
+
+    def assertCounters(self, client, total, completed):
+        client.refresh_from_db()
+        self.assertEqual((client.total_tasks, client.completed_tasks), (total, completed))
+
+    def assertStats(self, total, completed):
+        stats = UserStats.objects.get(user=self.user)
+        self.assertEqual((stats.total_tasks, stats.completed_tasks), (total, completed))
+
+    def assertRejected(self, operations, status, error):
+        response = self.post(operations)
+        self.assertEqual(response.status_code, status)
+        self.assertEqual(response.json(), {'success': False, 'error': error})
+        # Nothing from the batch was applied
+        self.assertEqual(Task.objects.filter(client__user=self.user).count(), 3)
+        self.assertStats(3, 1)
+
+    def test_other_users_task_is_not_found(self):
+        self.assertRejected(
+            [{'op': 'complete', 'task_id': self.invoice.pk}, {'op': 'delete', 'task_id': self.other_task.pk}],
+            404, 'Task not found',
+        )
+
+    def test_other_users_client_is_not_found(self):
+        self.assertRejected(
+            [{'op': 'create', 'client_id': self.acme.pk, 'title': 'Call'},
+             {'op': 'complete_all', 'client_id': self.other_client.pk}],
+            404, 'Client not found',
+        )
+        self.assertEqual(self.other_client.tasks.filter(is_completed=True).count(), 0)
+
+    def test_deleted_client_is_not_found(self):
+        delete_client(self.user, self.globex.pk)
+        operations = [{'op': 'create', 'client_id': self.globex.pk, 'title': 'Call'}]
+        with self.assertRaisesMessage(BatchError, 'Client not found'):
+            apply_batch(self.user, operations)
+        with self.assertRaisesMessage(BatchError, 'Task not found'):
+            apply_batch(self.user, [{'op': 'complete', 'task_id': self.plan.pk}])
+
+    def test_creates_then_completions_then_deletes(self):
+        result = apply_batch(self.user, [
+            {'op': 'delete', 'task_id': self.report.pk},
+            {'op': 'complete_all', 'client_id': self.acme.pk},
+            {'op': 'create', 'client_id': self.acme.pk, 'title': 'Call'},
+            {'op': 'complete', 'task_id': self.plan.pk},
+            {'op': 'delete', 'task_id': self.plan.pk},
+        ])
+        # The new task is completed by complete_all; completing a deleted task is skipped
+        call = Task.objects.get(pk__in=result['created'])
+        self.assertTrue(call.is_completed)
+        self.assertEqual((result['updated'], result['deleted']), (2, 2))
+        self.assertCounters(self.acme, 2, 2)
+        self.assertCounters(self.globex, 0, 0)
+        self.assertStats(2, 2)
+
+    def test_counters_after_complete_all_and_delete_all(self):
+        acme_version = Client.objects.get(pk=self.acme.pk).version
+        result = apply_batch(self.user, [
+            {'op': 'complete_all', 'client_id': self.acme.pk},
+            {'op': 'delete_all', 'client_id': self.globex.pk},
+        ])
+        self.assertEqual((result['updated'], result['deleted']), (1, 1))
+        self.assertCounters(self.acme, 2, 2)
+        self.assertCounters(self.globex, 0, 0)
+        self.assertGreater(Client.objects.get(pk=self.acme.pk).version, acme_version)
+        self.assertStats(2, 2)
+
+    def test_response(self):
+        response = self.post([{'op': 'uncomplete_all', 'client_id': self.acme.pk}])
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data['created'], data['updated'], data['deleted']), ([], 1, 0))
+        self.assertEqual(data['global']['completed_tasks'], 0)
+
+    def test_missing_or_malformed_operations_are_rejected(self):
+        self.assertRejected([], 400, 'operations must be a non-empty list')
+        self.assertRejected(None, 400, 'operations must be a non-empty list')
+        self.assertRejected(['complete'], 400, 'Each operation must be an object')
+        self.assertRejected([{'op': 'complete'}], 400, 'Invalid complete operation')
+        self.assertRejected([{'op': 'delete', 'task_id': 'x'}], 400, 'Invalid delete operation')
+        self.assertRejected([{'op': 'create', 'client_id': self.acme.pk}], 400, 'Task title is required')
+        self.assertRejected([{'op': 'archive', 'task_id': self.report.pk}], 400, "Unknown operation: 'archive'")
+
+    def test_conflicting_operations_are_rejected(self):
+        self.assertRejected(
+            [{'op': 'complete', 'task_id': self.invoice.pk}, {'op': 'uncomplete', 'task_id': self.invoice.pk}],
+            400, f'Conflicting operations for task {self.invoice.pk}',
+        )
+        self.assertRejected(
+            [{'op': 'complete_all', 'client_id': self.acme.pk}, {'op': 'uncomplete_all', 'client_id': self.acme.pk}],
+            400, f'Conflicting operations for client {self.acme.pk}',
+        )
+
+
+class SearchIndexTests(TestCase):
+    def test_index_follows_writes_after_all_migrations(self):
+        # On SQLite this fails when a migration rebuilt a table without reinstalling the FTS triggers
+        user = User.objects.create_user('owner', 'owner@example.com', 'pw')
+        acme = Client.objects.create(user=user, name='Acme')
+        task = Task.objects.create(client=acme, title='Quarterly report')
+        self.assertEqual([client.pk for client in search_clients(user, 'acm')], [acme.pk])
+        self.assertEqual([task.pk for task in search_tasks(user, 'quarter')], [task.pk])
+
+        Client.objects.filter(pk=acme.pk).update(name='Globex')
+        Task.objects.filter(pk=task.pk).update(title='Invoice')
+        self.assertEqual(search_clients(user, 'acme'), [])
+        self.assertEqual([client.pk for client in search_clients(user, 'globex')], [acme.pk])
+        self.assertEqual([task.pk for task in search_tasks(user, 'invoice')], [task.pk])
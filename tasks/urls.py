@@ -1,5 +1,11 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+if settings.ASYNC_VIEWS:
+    mutation_views = async_views
+else:
+    mutation_views = views
 
 urlpatterns = [
     path('login/', views.login_view, name='login'),
@@ -7,9 +13,19 @@ urlpatterns = [
     path('logout/', views.logout_view, name='logout'),
     path('forgot-password/', views.forgot_password_view, name='forgot_password'),
     path('', views.dashboard, name='dashboard'),
-    path('client/create/', views.client_create, name='client_create'),
+    path('stats/', views.stats, name='stats'),
+    path('search/', views.search, name='search'),
+    path('events/', async_views.events, name='events'),
+    path('export/', views.export, name='export'),
+    path('import/', views.import_data, name='import'),
+    path('metrics/', views.metrics, name='metrics'),
+    path('client/create/', mutation_views.client_create, name='client_create'),
     path('client/delete/<int:pk>/', views.client_delete, name='client_delete'),
-    path('client/<int:client_id>/task/create/', views.task_create, name='task_create'),
-    path('task/toggle/<int:pk>/', views.task_toggle, name='task_toggle'),
-    path('task/delete/<int:pk>/', views.task_delete, name='task_delete'),
+    path('client/<int:client_id>/tasks/', views.client_tasks, name='client_tasks'),
+    path('client/<int:client_id>/archived/', views.client_archived_tasks, name='client_archived_tasks'),
+    path('client/<int:client_id>/task/create/', mutation_views.task_create, name='task_create'),
+    path('task/batch/', views.task_batch, name='task_batch'),
+    path('task/toggle/<int:pk>/', mutation_views.task_toggle, name='task_toggle'),
+    path('task/completed/<int:pk>/', mutation_views.task_set_completed, name='task_set_completed'),
+    path('task/delete/<int:pk>/', mutation_views.task_delete, name='task_delete'),
 ]
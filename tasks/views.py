@@ -1,11 +1,86 @@
+import codecs
+import json
+
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth import login, logout, authenticate
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
-from django.views.decorators.http import require_POST
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.views.decorators.http import require_GET, require_POST
 from django.contrib.auth.models import User
-from .models import Client, Task
+from django.utils import timezone
+from .models import Client, UserStats
+from .backends import find_user
+from .batch import BatchError, apply_batch
+from .cache import cached_for_user, conditional_on_user_data
+from .counters import get_user_stats
+from .dashboard import (
+    MAX_TASK_PAGE_SIZE, TASK_PAGE_SIZE, InvalidCursor, load_dashboard_clients, load_task_page,
+)
+from .events import publish
+from .exports import EXPORT_FORMATS, aiterate, chunked, iter_export
+from .imports import IMPORT_FORMATS, InvalidImport, detect_format, import_records
+from .metrics import registry
+from .mutations import create_client, create_task, delete_client, delete_task, set_task_completed, toggle_task
+from .pool import render_metrics as render_pool_metrics
+from .search import SEARCH_PAGE_SIZE, search_clients, search_tasks
+
+
+def _client_progress(client):
+    """Client counters as returned by the JSON endpoints"""
+    return {
+        'id': client.id,
+        'completion_percentage': client.completion_percentage,
+        'remaining_percentage': client.remaining_percentage,
+        'total_tasks': client.total_tasks,
+        'completed_tasks': client.completed_tasks,
+    }
+
+
+def _global_progress(stats):
+    """User-wide counters as returned by the JSON endpoints"""
+    return {
+        'completion_percentage': stats.completion_percentage,
+        'remaining_percentage': stats.remaining_percentage,
+        'total_tasks': stats.total_tasks,
+        'completed_tasks': stats.completed_tasks,
+        'total_clients': stats.total_clients,
+    }
+
+
+def _wants_json(request):
+    """True for AJAX callers that asked for a JSON response instead of a redirect"""
+    return 'application/json' in request.headers.get('Accept', '')
+
+
+def _parse_bool(value):
+    """Optional boolean query parameter: None when absent, ValueError when malformed"""
+    if value in (None, ''):
+        return None
+    try:
+        return {'true': True, '1': True, 'false': False, '0': False}[value.lower()]
+    except KeyError:
+        raise ValueError(value) from None
+
+
+def _refresh_counters(client, user):
+    """Re-read the counters a mutation just changed"""
+    client.refresh_from_db(fields=['total_tasks', 'completed_tasks'])
+    # The mutation's adjust_* call guarantees the rollup row exists
+    return UserStats.objects.get(user=user)
+
+
+def _publish(user, event_type, stats, **payload):
+    """Push a change to the user's other open dashboards (see tasks.events)"""
+    publish(user.pk, {
+        'type': event_type,
+        'version': stats.version,
+        'global': _global_progress(stats),
+        **payload,
+    })
 
 
 def login_view(request):
@@ -19,16 +94,8 @@ def login_view(request):
         remember_me = request.POST.get('remember_me') == 'on'
         
         if email and password:
-            # Django uses username, but we'll allow email login
-            try:
-                user = User.objects.get(email=email)
-                username = user.username
-            except User.DoesNotExist:
-                # Try username if email doesn't work
-                username = email
-                user = None
-            
-            user = authenticate(request, username=username, password=password)
+            # EmailOrUsernameBackend resolves either identifier in one query
+            user = authenticate(request, username=email, password=password)
             
             if user is not None:
                 login(request, user)
@@ -43,7 +110,7 @@ def login_view(request):
         else:
             messages.error(request, 'Please fill in all fields.')
     
-    return render(request, 'tasks/login.html')
+    return render(request, 'tasks/login.html', {'lean_startup': settings.LEAN_STARTUP})
 
 
 def register_view(request):
@@ -122,14 +189,10 @@ def forgot_password_view(request):
 
         user = None
         if not errors:
-            # Try find by email first, then by username
-            try:
-                user = User.objects.get(email=identifier)
-            except User.DoesNotExist:
-                try:
-                    user = User.objects.get(username=identifier)
-                except User.DoesNotExist:
-                    errors.append('User not found with that email or username.')
+            # Email matches win over username matches
+            user = find_user(identifier)
+            if user is None:
+                errors.append('User not found with that email or username.')
 
         if errors:
             for error in errors:
@@ -152,35 +215,192 @@ def logout_view(request):
 
 
 @login_required
+@conditional_on_user_data
 def dashboard(request):
     """Main dashboard showing all clients with their tasks"""
-    # Only show current user's clients
-    clients = Client.objects.prefetch_related('tasks').filter(user=request.user)
-    
-    # Calculate global dashboard progress (only for current user)
-    all_tasks = Task.objects.filter(client__user=request.user)
-    total_tasks = all_tasks.count()
-    completed_tasks = all_tasks.filter(is_completed=True).count()
+    # Only show current user's client headers; tasks are loaded lazily per client.
+    # Served from the shared cache until the user's next write bumps their version.
+    clients = cached_for_user(request.user, 'dashboard_clients', lambda: load_dashboard_clients(request.user))
     
-    if total_tasks > 0:
-        global_completion = round((completed_tasks / total_tasks) * 100)
-        global_remaining = 100 - global_completion
-    else:
-        global_completion = 0
-        global_remaining = 0
+    # Global dashboard progress comes from the stored per-user rollup
+    stats = get_user_stats(request.user)
     
     context = {
         'clients': clients,
-        'total_clients': clients.count(),
-        'total_tasks': total_tasks,
-        'completed_tasks': completed_tasks,
-        'pending_tasks': total_tasks - completed_tasks,
-        'global_completion': global_completion,
-        'global_remaining': global_remaining,
+        'total_clients': len(clients),
+        'total_tasks': stats.total_tasks,
+        'completed_tasks': stats.completed_tasks,
+        'pending_tasks': stats.pending_tasks,
+        'global_completion': stats.completion_percentage,
+        'global_remaining': stats.remaining_percentage,
+        'fragment_timeout': settings.TASKS_FRAGMENT_TIMEOUT,
     }
     return render(request, 'tasks/dashboard.html', context)
 
 
+@require_GET
+@login_required
+@conditional_on_user_data
+def stats(request):
+    """Current global and per-client counters, for clients that poll instead of reloading"""
+    def build():
+        return {
+            'success': True,
+            'clients': [_client_progress(client) for client in load_dashboard_clients(request.user)],
+            'global': _global_progress(get_user_stats(request.user)),
+        }
+    
+    return JsonResponse(cached_for_user(request.user, 'stats', build))
+
+
+def _task_page(request, client_id, archived):
+    # Only allow listing tasks of own clients
+    client = get_object_or_404(Client.objects.only('id'), pk=client_id, user=request.user)
+    cursor = request.GET.get('cursor') or None
+    
+    try:
+        limit = max(1, min(int(request.GET.get('limit', TASK_PAGE_SIZE)), MAX_TASK_PAGE_SIZE))
+        rows, next_cursor = load_task_page(client, cursor, limit, archived=archived)
+    except (ValueError, InvalidCursor):
+        return JsonResponse({'success': False, 'error': 'Invalid page parameters'}, status=400)
+    
+    template = 'tasks/partials/archived_task_rows.html' if archived else 'tasks/partials/task_rows.html'
+    return JsonResponse({
+        'success': True,
+        'tasks': [
+            {'id': row.id, 'title': row.title, 'is_completed': row.is_completed}
+            for row in rows
+        ],
+        'next_cursor': next_cursor,
+        'html': render_to_string(template, {
+            'tasks': rows,
+            'first_page': cursor is None,
+        }),
+    })
+
+
+@require_GET
+@login_required
+@conditional_on_user_data
+def client_tasks(request, client_id):
+    """One keyset-paginated page of a client's tasks, loaded when the client is expanded"""
+    return _task_page(request, client_id, archived=False)
+
+
+@require_GET
+@login_required
+@conditional_on_user_data
+def client_archived_tasks(request, client_id):
+    """One page of a client's archived tasks, loaded on demand from the client card"""
+    return _task_page(request, client_id, archived=True)
+
+
+@require_GET
+@login_required
+@conditional_on_user_data
+def search(request):
+    """Ranked, paginated search over the current user's clients and task titles"""
+    query = request.GET.get('q', '').strip()
+    try:
+        page = max(1, int(request.GET.get('page', 1)))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid page'}, status=400)
+    
+    if not query:
+        return JsonResponse({'success': True, 'query': query, 'page': page, 'clients': [], 'tasks': [], 'has_more': False})
+    
+    # Fetch one extra row of each kind to know whether another page exists
+    offset = (page - 1) * SEARCH_PAGE_SIZE
+    clients = search_clients(request.user, query, SEARCH_PAGE_SIZE + 1, offset)
+    tasks = search_tasks(request.user, query, SEARCH_PAGE_SIZE + 1, offset)
+    
+    return JsonResponse({
+        'success': True,
+        'query': query,
+        'page': page,
+        'clients': [
+            {
+                'id': client.id,
+                'name': client.name,
+                'total_tasks': client.total_tasks,
+                'completion_percentage': client.completion_percentage,
+            }
+            for client in clients[:SEARCH_PAGE_SIZE]
+        ],
+        'tasks': [
+            {
+                'id': task.id,
+                'title': task.title,
+                'is_completed': task.is_completed,
+                'client_id': task.client_id,
+                'client_name': task.client_name,
+            }
+            for task in tasks[:SEARCH_PAGE_SIZE]
+        ],
+        'has_more': len(clients) > SEARCH_PAGE_SIZE or len(tasks) > SEARCH_PAGE_SIZE,
+    })
+
+
+@require_GET
+@staff_member_required
+def metrics(request):
+    """
+    Per-view latency histograms and database pool counters of this process, in
+    the Prometheus text format (see tasks.metrics and tasks.pool)
+    """
+    return HttpResponse(registry.render() + render_pool_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@require_GET
+@login_required
+def export(request):
+    """Stream the user's clients and tasks as CSV or JSON lines (see tasks.exports)"""
+    fmt = request.GET.get('format', 'csv')
+    try:
+        client_ids = [int(pk) for pk in request.GET.getlist('client')]
+        completed = _parse_bool(request.GET.get('completed'))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid export filters'}, status=400)
+    if fmt not in EXPORT_FORMATS:
+        return JsonResponse({'success': False, 'error': 'Unknown export format'}, status=400)
+    
+    content_type, extension = EXPORT_FORMATS[fmt]
+    blocks = chunked(iter_export(request.user, fmt, client_ids, completed))
+    # Under ASGI the response must be fed asynchronously to stay streamed
+    response = StreamingHttpResponse(aiterate(blocks) if settings.ASYNC_VIEWS else blocks, content_type=content_type)
+    filename = f'goalgrid-export-{timezone.localdate():%Y%m%d}.{extension}'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@require_POST
+@login_required
+def import_data(request):
+    """
+    Bulk-create clients and tasks from CSV or JSON lines (see tasks.imports), sent
+    either as a multipart ``file`` upload or as the raw request body
+    """
+    upload = request.FILES.get('file')
+    fmt = request.GET.get('format') or detect_format(upload and upload.name, request.content_type)
+    try:
+        dry_run = bool(_parse_bool(request.GET.get('dry_run')))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid dry_run flag'}, status=400)
+    if fmt not in IMPORT_FORMATS:
+        return JsonResponse({'success': False, 'error': 'Unknown import format'}, status=400)
+    
+    # Read line by line, never holding the whole payload in memory
+    lines = codecs.iterdecode(upload if upload else request, 'utf-8-sig')
+    try:
+        result = import_records(request.user, lines, fmt, dry_run=dry_run)
+    except InvalidImport as e:
+        return JsonResponse({'success': False, 'error': str(e), **e.result}, status=400)
+    except UnicodeDecodeError:
+        return JsonResponse({'success': False, 'error': 'The file must be UTF-8 encoded'}, status=400)
+    
+    return JsonResponse({'success': True, 'dry_run': dry_run, **result})
+
+
 @require_POST
 @login_required
 def client_create(request):
@@ -194,18 +414,25 @@ def client_create(request):
     if Client.objects.filter(user=request.user, name=client_name).exists():
         return JsonResponse({'success': False, 'error': 'Client with this name already exists'}, status=400)
     
-    client = Client.objects.create(user=request.user, name=client_name)
+    client = create_client(request.user, client_name)
+    
+    stats = UserStats.objects.get(user=request.user)
+    client_data = {
+        'id': client.id,
+        'name': client.name,
+        'completion_percentage': client.completion_percentage,
+        'remaining_percentage': client.remaining_percentage,
+        'total_tasks': client.total_tasks,
+        'completed_tasks': client.completed_tasks,
+    }
+    html = render_to_string('tasks/partials/client_card.html', {'client': client})
+    _publish(request.user, 'client.created', stats, client=client_data, html=html)
     
     return JsonResponse({
         'success': True,
-        'client': {
-            'id': client.id,
-            'name': client.name,
-            'completion_percentage': client.completion_percentage,
-            'remaining_percentage': client.remaining_percentage,
-            'total_tasks': client.total_tasks,
-            'completed_tasks': client.completed_tasks,
-        }
+        'client': client_data,
+        'global': _global_progress(stats),
+        'html': html,
     })
 
 
@@ -214,9 +441,19 @@ def client_create(request):
 def client_delete(request, pk):
     """Delete a client and all its tasks"""
     # Only allow deleting own clients
-    client = get_object_or_404(Client, pk=pk, user=request.user)
+    client = delete_client(request.user, pk)
     client_name = client.name
-    client.delete()
+    
+    stats = UserStats.objects.get(user=request.user)
+    _publish(request.user, 'client.deleted', stats, client_id=pk)
+    
+    if _wants_json(request):
+        return JsonResponse({
+            'success': True,
+            'client_id': pk,
+            'global': _global_progress(stats),
+        })
+    
     messages.success(request, f'Client "{client_name}" and all its tasks deleted successfully!')
     return redirect('dashboard')
 
@@ -232,10 +469,17 @@ def task_create(request, client_id):
     if not task_title:
         return JsonResponse({'success': False, 'error': 'Task title is required'}, status=400)
     
-    task = Task.objects.create(client=client, title=task_title)
+    task = create_task(client, task_title)
     
-    # Recalculate client progress
-    client.refresh_from_db()
+    # Read back the updated client progress
+    stats = _refresh_counters(client, request.user)
+    html = render_to_string('tasks/partials/task_row.html', {'task': task})
+    _publish(
+        request.user, 'task.created', stats,
+        task={'id': task.id, 'client_id': client.id, 'is_completed': task.is_completed},
+        client=_client_progress(client),
+        html=html,
+    )
     
     return JsonResponse({
         'success': True,
@@ -244,12 +488,9 @@ def task_create(request, client_id):
             'title': task.title,
             'is_completed': task.is_completed,
         },
-        'client': {
-            'completion_percentage': client.completion_percentage,
-            'remaining_percentage': client.remaining_percentage,
-            'total_tasks': client.total_tasks,
-            'completed_tasks': client.completed_tasks,
-        }
+        'client': _client_progress(client),
+        'global': _global_progress(stats),
+        'html': html,
     })
 
 
@@ -258,42 +499,54 @@ def task_create(request, client_id):
 def task_toggle(request, pk):
     """Toggle task completion status via AJAX"""
     # Only allow toggling own tasks
-    task = get_object_or_404(Task, pk=pk, client__user=request.user)
-    task.is_completed = not task.is_completed
-    task.save()
+    task = toggle_task(request.user, pk)
     
-    # Recalculate client progress
+    # Read back the updated client and global progress
     client = task.client
-    client.refresh_from_db()
+    stats = _refresh_counters(client, request.user)
+    _publish(
+        request.user, 'task.updated', stats,
+        task={'id': task.id, 'client_id': client.id, 'is_completed': task.is_completed},
+        client=_client_progress(client),
+    )
     
-    # Recalculate global progress (only for current user)
-    all_tasks = Task.objects.filter(client__user=request.user)
-    total_tasks = all_tasks.count()
-    completed_tasks = all_tasks.filter(is_completed=True).count()
+    return JsonResponse({
+        'success': True,
+        'is_completed': task.is_completed,
+        'client': _client_progress(client),
+        'global': _global_progress(stats),
+    })
+
+
+@require_POST
+@login_required
+def task_set_completed(request, pk):
+    """Set task completion to the posted state via AJAX; repeating the request is harmless"""
+    try:
+        completed = _parse_bool(request.POST.get('completed'))
+    except ValueError:
+        completed = None
+    if completed is None:
+        return JsonResponse({'success': False, 'error': 'completed must be true or false'}, status=400)
     
-    if total_tasks > 0:
-        global_completion = round((completed_tasks / total_tasks) * 100)
-        global_remaining = 100 - global_completion
-    else:
-        global_completion = 0
-        global_remaining = 0
+    # Only allow updating own tasks
+    task, changed = set_task_completed(request.user, pk, completed)
+    
+    client = task.client
+    stats = _refresh_counters(client, request.user)
+    if changed:
+        _publish(
+            request.user, 'task.updated', stats,
+            task={'id': task.id, 'client_id': client.id, 'is_completed': task.is_completed},
+            client=_client_progress(client),
+        )
     
     return JsonResponse({
         'success': True,
+        'changed': changed,
         'is_completed': task.is_completed,
-        'client': {
-            'id': client.id,
-            'completion_percentage': client.completion_percentage,
-            'remaining_percentage': client.remaining_percentage,
-            'total_tasks': client.total_tasks,
-            'completed_tasks': client.completed_tasks,
-        },
-        'global': {
-            'completion_percentage': global_completion,
-            'remaining_percentage': global_remaining,
-            'total_tasks': total_tasks,
-            'completed_tasks': completed_tasks,
-        }
+        'client': _client_progress(client),
+        'global': _global_progress(stats),
     })
 
 
@@ -302,20 +555,47 @@ def task_toggle(request, pk):
 def task_delete(request, pk):
     """Delete a task"""
     # Only allow deleting own tasks
-    task = get_object_or_404(Task, pk=pk, client__user=request.user)
-    client = task.client
-    task.delete()
+    client = delete_task(request.user, pk).client
     
-    # Recalculate client progress
-    client.refresh_from_db()
+    # Read back the updated client progress
+    stats = _refresh_counters(client, request.user)
+    _publish(
+        request.user, 'task.deleted', stats,
+        task={'id': pk, 'client_id': client.id},
+        client=_client_progress(client),
+    )
     
     return JsonResponse({
         'success': True,
-        'client': {
-            'id': client.id,
-            'completion_percentage': client.completion_percentage,
-            'remaining_percentage': client.remaining_percentage,
-            'total_tasks': client.total_tasks,
-            'completed_tasks': client.completed_tasks,
-        }
+        'client': _client_progress(client),
+        'global': _global_progress(stats),
+    })
+
+
+@require_POST
+@login_required
+def task_batch(request):
+    """Apply a JSON list of task operations in one transaction (see tasks.batch)"""
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid JSON body'}, status=400)
+    
+    operations = payload.get('operations') if isinstance(payload, dict) else None
+    try:
+        result = apply_batch(request.user, operations)
+    except BatchError as e:
+        return JsonResponse({'success': False, 'error': e.message}, status=e.status)
+    
+    stats = UserStats.objects.get(user=request.user)
+    clients = [_client_progress(client) for client in result['clients']]
+    _publish(request.user, 'tasks.changed', stats, clients=clients)
+    
+    return JsonResponse({
+        'success': True,
+        'created': result['created'],
+        'updated': result['updated'],
+        'deleted': result['deleted'],
+        'clients': clients,
+        'global': _global_progress(stats),
     })